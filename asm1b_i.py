@@ -32,27 +32,22 @@ if __name__ == "__main__":
     print("Initial marking: [1.free]\n")
     s_net.set_markings(init_marking)
 
-    # find all firing rules:
-    firing_rules = s_net.run_sequent()
+    # build the reachability graph:
+    graph = s_net.reachability_graph()
 
-    # find all markings at states and all transitions in the new transition
-    states = set()
-    transitions = set()
+    # all markings at states and all transitions in the new transition system
     print("All firing rules: ")
-    for trans in firing_rules:
-        states.add("[" + ", ".join([trans[0][i] for i in range(len(trans[0]))]) + "]")
-        states.add("[" + ", ".join([trans[2][i] for i in range(len(trans[2]))]) + "]")
-        transitions.add(trans[1][0])
-        print("[", ", ".join([trans[0][i] for i in range(len(trans[0]))]), "]", end="  ", sep="")
-        print("[", trans[1][0], ">", "  [", ", ".join([trans[2][i] for i in range(len(trans[2]))]), "]", sep="")
+    for source, t, target in graph.edges:
+        print(graph.label(source), end="  ")
+        print("[", graph.transition_name(t), ">", "  ", graph.label(target), sep="")
 
-    print("All states: ", "; ".join([st for st in states]))
-    print("All transitions: ", "; ".join([trans for trans in transitions]))
+    print("All states: ", "; ".join([graph.label(state) for state in range(len(graph))]))
+    print("All transitions: ", "; ".join(set(graph.transition_name(t) for _, t, _ in graph.edges)))
 
     # create graph 
     ts_i = graphviz.Digraph('finite_state_machine', filename='asm1_i.gv', format='png')
     ts_i.attr(rankdir='LR')
-    start = str('[1.free]')
+    start = graph.label(0)
 
     ts_i.attr('node', shape='point')
     ts_i.node('start')
@@ -61,11 +56,8 @@ if __name__ == "__main__":
     ts_i.edge('start', start)
 
     # adding edges to the graph
-    for edge in firing_rules:
-        source = '[' + ", ".join([edge[0][i] for i in range(len(edge[0]))]) + ']'
-        dest = '[' + ", ".join([edge[2][i] for i in range(len(edge[2]))]) + ']'
-        name = str(edge[1][0])
-        ts_i.edge(source, dest, name)
+    for source, t, target in graph.edges:
+        ts_i.edge(graph.label(source), graph.label(target), graph.transition_name(t))
 
     root_folder = os.path.dirname(os.path.abspath(__file__))
 
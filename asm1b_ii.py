@@ -18,26 +18,21 @@ if __name__ == '__main__':
     # set max_token in place: [busy]
     s_net._places['busy']._max_token = 1
 
-    # find all riring rules:
-    firing_rules = list(s_net.run_sequent())
+    # build the reachability graph:
+    graph = s_net.reachability_graph()
 
-    # find all markings at states and all transitions in the new transition
-    states = set()
-    transitions = set()
+    # all markings at states and all transitions in the new transition system
     print("All firing rules: ")
-    for trans in firing_rules:
-        states.add("[" + ", ".join([trans[0][i] for i in range(len(trans[0]))]) + "]")
-        states.add("[" + ", ".join([trans[2][i] for i in range(len(trans[2]))]) + "]")
-        transitions.add(trans[1][0])
-        print("[", ", ".join([trans[0][i] for i in range(len(trans[0]))]), "]", end="  ", sep="")
-        print("[", trans[1][0], ">", "  [", ", ".join([trans[2][i] for i in range(len(trans[2]))]), "]", sep="")
+    for source, t, target in graph.edges:
+        print(graph.label(source), end="  ")
+        print("[", graph.transition_name(t), ">", "  ", graph.label(target), sep="")
 
-    print("All states: ", "; ".join([st for st in states]))
-    print("All transitions: ", "; ".join([trans for trans in transitions]))
+    print("All states: ", "; ".join([graph.label(state) for state in range(len(graph))]))
+    print("All transitions: ", "; ".join(set(graph.transition_name(t) for _, t, _ in graph.edges)))
 
     # create graph 
     ts_ii = graphviz.Digraph('finite_state_machine', filename='asm1_ii.gv', format='png')
-    start = str('[2.free]')
+    start = graph.label(0)
 
     ts_ii.attr(rankdir='LR')
     ts_ii.attr('node', shape='point')
@@ -47,11 +42,8 @@ if __name__ == '__main__':
     ts_ii.edge('start', start)
 
     # adding edges to the graph
-    for edge in firing_rules:
-        source = '[' + ", ".join([edge[0][i] for i in range(len(edge[0]))]) + ']'
-        dest = '[' + ", ".join([edge[2][i] for i in range(len(edge[2]))]) + ']'
-        name = str(edge[1][0])
-        ts_ii.edge(source, dest, name, penwidth='3.0')
+    for source, t, target in graph.edges:
+        ts_ii.edge(graph.label(source), graph.label(target), graph.transition_name(t), penwidth='3.0')
 
     root_folder = os.path.dirname(os.path.abspath(__file__))
 
@@ -0,0 +1,119 @@
+"""
+Benchmarks of firing, exploration and composition over the families of families.py.
+Run from the repository root: python benchmarks/bench.py [--quick] [--family NAME] [--size N]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import net as ptn
+from families import FAMILIES
+from reachability import count_states
+
+
+def _build(builder, param) -> ptn.PetriNet:
+    return builder(*param) if isinstance(param, tuple) else builder(param)
+
+
+def _time(func, repeat: int, number=1) -> float:
+    """
+    Best time of one call in seconds
+    """
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def _peak(func) -> int:
+    """
+    Peak of the memory allocated by one call in bytes
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _quiet(func):
+    """
+    func with its printing thrown away
+    """
+    def call():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func()
+    return call
+
+
+def bench_net(petri_net: ptn.PetriNet, repeat: int) -> dict:
+    """
+    Time fireable/fire on every transition, run_sequent, run_concurrent and __add__ of one net
+    """
+    markings = petri_net.get_markings()
+    transitions = list(petri_net._transitions.values())
+    compiled = petri_net.compile()
+    marking = compiled.initial
+    n_transitions = len(transitions)
+
+    def fireable():
+        for transition in transitions:
+            transition.fireable()
+
+    def fire():
+        for transition in transitions:
+            transition.fire()
+            petri_net._restore(markings)
+
+    def compiled_fire():
+        for t in compiled.enabled(marking):
+            compiled.fire(t, marking)
+
+    run_sequent = _quiet(petri_net.run_sequent)
+    run_concurrent = _quiet(petri_net.run_concurrent)
+
+    def add():
+        return petri_net + petri_net
+
+    result = {
+        "states": count_states(petri_net),
+        "fireable_us": _time(fireable, repeat, 100) / n_transitions * 1e6,
+        "fire_us": _time(fire, repeat, 100) / n_transitions * 1e6,
+        "compiled_fire_us": _time(compiled_fire, repeat, 100) / max(len(compiled.enabled(marking)), 1) * 1e6,
+        "run_sequent_s": _time(run_sequent, repeat),
+        "run_sequent_peak_kb": _peak(run_sequent) / 1024,
+        "run_concurrent_s": _time(run_concurrent, repeat),
+        "add_s": _time(add, repeat),
+        "add_peak_kb": _peak(add) / 1024,
+    }
+    petri_net._restore(markings)
+    return result
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the petri net engines on parametric nets")
+    parser.add_argument("--family", action="append", choices=sorted(FAMILIES),
+                        help="family to run (may be repeated, all by default)")
+    parser.add_argument("--size", type=int, default=None,
+                        help="number of sizes per family to run, from the smallest")
+    parser.add_argument("--quick", action="store_true", help="only the three smallest sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions per timing, the best one is kept")
+    args = parser.parse_args(argv)
+    size = 3 if args.quick and args.size is None else args.size
+
+    columns = ["states", "fireable_us", "fire_us", "compiled_fire_us", "run_sequent_s",
+               "run_sequent_peak_kb", "run_concurrent_s", "add_s", "add_peak_kb"]
+    print("family", "param", *columns, sep="\t")
+    for name in args.family or FAMILIES:
+        builder, params = FAMILIES[name]
+        for param in params[:size]:
+            result = bench_net(_build(builder, param), args.repeat)
+            print(name, param, *["{:.4g}".format(result[c]) for c in columns], sep="\t", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Parametric families of petri nets for the benchmarks
+"""
+import net as ptn
+
+
+def _build(places: list, transitions: dict) -> ptn.PetriNet:
+    """
+    Petri net from plain data
+    :places: [(name, holding, max_token)]
+    :transitions: {name: ([input place names], [output place names])}
+    """
+    place_list = [(name, ptn.Place(holding, max_token)) for name, holding, max_token in places]
+    index = dict((name, i) for i, (name, _) in enumerate(place_list))
+    return ptn.PetriNet(dict((name, ptn.Transition(place_list, [index[p] for p in inputs], [index[p] for p in outputs]))
+                             for name, (inputs, outputs) in transitions.items()),
+                        dict(place_list))
+
+
+def specialist(i: int) -> ptn.PetriNet:
+    """
+    One copy of the s_net cycle free -> busy -> docu -> free, with its own place and transition names
+    """
+    free, busy, docu = "free{}".format(i), "busy{}".format(i), "docu{}".format(i)
+    return _build([(free, 1, -1), (busy, 0, -1), (docu, 0, -1)],
+                  {"start{}".format(i): ([free], [busy]),
+                   "change{}".format(i): ([busy], [docu]),
+                   "end{}".format(i): ([docu], [free])})
+
+
+def specialists(n: int) -> ptn.PetriNet:
+    """
+    n independent specialist cycles, 3^n reachable markings
+    """
+    return ptn.compose(*[specialist(i) for i in range(n)])
+
+
+def patients(k: int, n=1) -> ptn.PetriNet:
+    """
+    n specialists taking k patients from the queue of p_net (wait -> inside -> done), as m_net of asm3.py
+    """
+    nets = []
+    for i in range(n):
+        free, busy, docu = "free{}".format(i), "busy{}".format(i), "docu{}".format(i)
+        nets.append(_build([(free, 1, -1), (busy, 0, -1), (docu, 0, -1),
+                            ("wait", k, -1), ("inside", 0, -1), ("done", 0, -1)],
+                           {"start{}".format(i): ([free, "wait"], [busy, "inside"]),
+                            "change{}".format(i): ([busy, "inside"], [docu, "done"]),
+                            "end{}".format(i): ([docu], [free])}))
+    return ptn.compose(*nets)
+
+
+def philosophers(n: int) -> ptn.PetriNet:
+    """
+    n dining philosophers taking the left fork, then the right one (deadlocks when all hold their left fork)
+    """
+    places = []
+    transitions = {}
+    for i in range(n):
+        places += [("think{}".format(i), 1, -1), ("left{}".format(i), 0, -1),
+                   ("eat{}".format(i), 0, -1), ("fork{}".format(i), 1, -1)]
+    for i in range(n):
+        fork, right = "fork{}".format(i), "fork{}".format((i + 1) % n)
+        transitions["take_left{}".format(i)] = (["think{}".format(i), fork], ["left{}".format(i)])
+        transitions["take_right{}".format(i)] = (["left{}".format(i), right], ["eat{}".format(i)])
+        transitions["release{}".format(i)] = (["eat{}".format(i)], ["think{}".format(i), fork, right])
+    return _build(places, transitions)
+
+
+def producer_consumer(n: int, buffer=2) -> ptn.PetriNet:
+    """
+    n producers and n consumers sharing a buffer of the given size (free slots are a place too)
+    """
+    places = [("buffer", 0, buffer), ("slots", buffer, buffer)]
+    transitions = {}
+    for i in range(n):
+        places += [("producing{}".format(i), 1, -1), ("ready{}".format(i), 0, -1),
+                   ("consuming{}".format(i), 0, -1), ("idle{}".format(i), 1, -1)]
+        transitions["produce{}".format(i)] = (["producing{}".format(i)], ["ready{}".format(i)])
+        transitions["put{}".format(i)] = (["ready{}".format(i), "slots"], ["producing{}".format(i), "buffer"])
+        transitions["get{}".format(i)] = (["idle{}".format(i), "buffer"], ["consuming{}".format(i), "slots"])
+        transitions["consume{}".format(i)] = (["consuming{}".format(i)], ["idle{}".format(i)])
+    return _build(places, transitions)
+
+
+# family name -> (builder, parameters from about 10 to about 10^6 reachable markings)
+FAMILIES = {
+    "specialists": (specialists, [2, 4, 6, 8, 10, 12]),
+    "patients": (patients, [(10, 1), (20, 2), (40, 3), (60, 4), (60, 6), (80, 8)]),
+    "philosophers": (philosophers, [2, 4, 6, 8, 10, 12, 14]),
+    "producer_consumer": (producer_consumer, [(1, 1), (2, 2), (3, 3), (4, 4), (5, 6), (6, 8), (8, 8)]),
+}
@@ -0,0 +1,239 @@
+"""
+Long explorations with a checkpoint log: the reachability graph is appended to a file while it is built,
+a later process resumes where the last one stopped, a budget stops it cleanly with the partial graph
+"""
+import hashlib
+import os
+import struct
+import sys
+from time import perf_counter
+from engine import as_compiled
+from reachability import ReachabilityGraph
+
+try:
+    import resource
+except ImportError:     # not on Windows
+    resource = None
+
+MAGIC = b"PNCK"
+VERSION = 1
+_HEADER = struct.Struct("<4sII20s")     # magic, version, places, digest of the net structure
+_EDGE = struct.Struct("<iii")           # source, transition index, target
+_EXPANDED = struct.Struct("<i")         # state whose edges are all written
+_TIME = struct.Struct("<dq")            # seconds spent so far, states expanded so far
+
+
+def _digest(compiled) -> bytes:
+    """
+    Hash of the net structure and initial marking, a log only resumes the net it was written for
+    """
+    text = repr((compiled.place_names, compiled.capacity, compiled.transition_names,
+                 [tuple(arc) for arc in compiled.pre], [tuple(arc) for arc in compiled.post], compiled.initial))
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+def memory_used() -> int:
+    """
+    Peak resident memory of the process in bytes, None without the resource module
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Budget:
+    def __init__(self, seconds=None, states=None, memory=None):
+        """
+        Limits of one run, checked after every expanded state.
+        :seconds: Wall clock seconds of the run.
+        :states: Number of states in the graph (previous runs included).
+        :memory: Peak resident memory of the process in bytes (needs the resource module).
+        """
+        if memory is not None and resource is None:
+            raise ValueError("A memory budget needs the resource module")
+        self.seconds = seconds
+        self.states = states
+        self.memory = memory
+        self._start = None
+
+    def start(self) -> None:
+        self._start = perf_counter()
+
+    def exceeded(self, states: int) -> str:
+        """
+        "time", "states" or "memory" for the first limit reached, None if there is none
+        """
+        if self.seconds is not None and perf_counter() - self._start >= self.seconds:
+            return "time"
+        if self.states is not None and states >= self.states:
+            return "states"
+        if self.memory is not None and memory_used() >= self.memory:
+            return "memory"
+        return None
+
+
+class Checkpoint:
+    def __init__(self, net, path: str, flush_every=1024):
+        """
+        Breadth-first reachability graph kept in an append-only log of records:
+        new states (their marking), edges, "state expanded" markers and the time spent.
+        Opening an existing log reads the graph back and cuts off the expansion it was in the middle of,
+        so run() goes on exactly as if it had never stopped.
+        :net: PetriNet or CompiledNet object, the same net the log was written for.
+        :path: Log file, created if missing.
+        :flush_every: Write the log to disk every that many expanded states.
+        """
+        self.compiled = as_compiled(net)
+        self.path = path
+        self.flush_every = flush_every
+        self.graph = ReachabilityGraph(self.compiled)
+        self.expanded = 0       # states 0 .. expanded - 1 have all their edges
+        self.elapsed = 0.0      # seconds spent in run() over every process
+        self.stopped = None     # budget limit which stopped the last run
+        places = len(self.compiled.place_names)
+        self._state = struct.Struct("<{}i".format(places))
+        header = _HEADER.pack(MAGIC, VERSION, places, _digest(self.compiled))
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            end = self._load(header)
+            self._file = open(path, "r+b")
+            self._file.truncate(end)
+            self._file.seek(end)
+        else:
+            self._file = open(path, "wb")
+            self._file.write(header)
+            self.graph.add_state(self.compiled.initial)
+            self._file.write(b"S" + self._state.pack(*self.compiled.initial))
+
+    def _load(self, header: bytes) -> int:
+        """
+        Read the log back, return the offset after the last complete expansion
+        """
+        with open(self.path, "rb") as f:
+            data = f.read()
+        if data[:_HEADER.size] != header:
+            raise ValueError("'{}' isn't a checkpoint of this net".format(self.path))
+        graph = self.graph
+        records = {b"S": self._state, b"E": _EDGE, b"X": _EXPANDED, b"T": _TIME}
+        pos = _HEADER.size
+        end = _HEADER.size + 1 + self._state.size     # after the initial state
+        states = []     # records of the expansion going on, added when it is complete
+        edges = []
+        while pos < len(data):
+            tag = data[pos:pos + 1]
+            layout = records.get(tag)
+            if layout is None or pos + 1 + layout.size > len(data):
+                break   # torn record of a crash
+            values = layout.unpack_from(data, pos + 1)
+            pos += 1 + layout.size
+            if tag == b"S":
+                states.append(values)
+            elif tag == b"E":
+                edges.append(values)
+            elif tag == b"X":
+                for marking in states:
+                    graph.add_state(marking)
+                for edge in edges:
+                    graph.add_edge(*edge)
+                states = []
+                edges = []
+                self.expanded = values[0] + 1
+                end = pos
+            else:
+                self.elapsed = values[0]
+                end = pos
+        if not graph.markings:
+            graph.add_state(self.compiled.initial)
+        # the states and edges of a cut off expansion are found again when it is redone
+        return end
+
+    @property
+    def done(self) -> bool:
+        """
+        True when every state is expanded
+        """
+        return self.expanded == len(self.graph)
+
+    def run(self, budget=None, stats=None) -> ReachabilityGraph:
+        """
+        Go on with the exploration until every state is expanded or the budget is used up,
+        then write the log to disk. The graph (also self.graph) is truncated if the budget stopped it,
+        self.stopped tells which limit.
+        :budget: Optional Budget of this run.
+        :stats: Optional RunStats collecting counters and timings.
+        """
+        compiled = self.compiled
+        graph = self.graph
+        write = self._file.write
+        pack_state = self._state.pack
+        lookup = graph.index.get
+        if stats is not None:
+            compiled = stats.instrument(compiled)
+            lookup = stats.timed("hashing", lookup)
+        if budget is not None:
+            budget.start()
+        start = perf_counter()
+        self.stopped = None
+        since_flush = 0
+        while self.expanded < len(graph.markings):
+            state = self.expanded
+            marking = graph.markings[state]
+            if stats is not None:
+                stats.expand(len(graph.markings) - state - 1, len(graph.markings))
+            for t in compiled.enabled(marking):
+                successor = compiled.fire(t, marking)
+                target = lookup(successor)
+                if target is None:
+                    target = graph.add_state(successor)
+                    write(b"S" + pack_state(*successor))
+                graph.add_edge(state, t, target)
+                write(b"E" + _EDGE.pack(state, t, target))
+            write(b"X" + _EXPANDED.pack(state))
+            self.expanded += 1
+            since_flush += 1
+            if since_flush >= self.flush_every:
+                self._flush(start)
+                start = perf_counter()
+                since_flush = 0
+            if budget is not None:
+                self.stopped = budget.exceeded(len(graph.markings))
+                if self.stopped is not None:
+                    break
+        self._flush(start)
+        graph.truncated = not self.done
+        if stats is not None:
+            stats.stop(len(graph.markings))
+        return graph
+
+    def _flush(self, start: float) -> None:
+        """
+        Add the time since start to the log and push it to disk
+        """
+        self.elapsed += perf_counter() - start
+        self._file.write(b"T" + _TIME.pack(self.elapsed, self.expanded))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def explore(net, path: str, budget=None, flush_every=1024, stats=None) -> ReachabilityGraph:
+    """
+    Breadth-first reachability graph with a checkpoint log, resumed from the log if it exists.
+    The same graph as reachability.explore(net), truncated if the budget stopped it;
+    calling it again with the same path goes on from there.
+    :net: PetriNet or CompiledNet object.
+    :path: Log file.
+    :budget: Optional Budget of this run.
+    :flush_every: Write the log to disk every that many expanded states.
+    :stats: Optional RunStats collecting counters and timings.
+    """
+    with Checkpoint(net, path, flush_every) as checkpoint:
+        return checkpoint.run(budget, stats)
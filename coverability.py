@@ -0,0 +1,114 @@
+"""
+Coverability (Karp-Miller) analysis, terminates on nets with unbounded places
+"""
+from engine import as_compiled
+
+OMEGA = float("inf")    # "any number of tokens"
+
+
+class CoverabilityGraph:
+    def __init__(self, compiled):
+        """
+        Coverability graph of a petri net: markings may hold OMEGA in places
+        which can get arbitrarily many tokens. State 0 is the initial marking.
+        :compiled: The CompiledNet the graph is built from.
+        """
+        self.compiled = compiled
+        self.markings = []      # state id -> marking (may contain OMEGA)
+        self.index = {}         # marking -> state id
+        self.parent = []        # state id -> state id it was discovered from (-1 for the initial state)
+        self.edges = []         # (source id, transition index, target id)
+        self.truncated = False  # True if max_states cut the construction
+
+    def __len__(self) -> int:
+        return len(self.markings)
+
+    def add_state(self, marking: tuple, parent: int) -> int:
+        state = len(self.markings)
+        self.markings.append(marking)
+        self.index[marking] = state
+        self.parent.append(parent)
+        return state
+
+    def bounds(self) -> dict:
+        """
+        Maximum tokens of every place over all markings (OMEGA for unbounded places)
+        """
+        return dict((name, max(m[p] for m in self.markings)) for p, name in enumerate(self.compiled.place_names))
+
+    def unbounded_places(self) -> list:
+        """
+        Names of the places which can hold arbitrarily many tokens
+        """
+        return [name for name, bound in self.bounds().items() if bound == OMEGA]
+
+    def bounded(self) -> bool:
+        return not self.unbounded_places()
+
+    def minimal_set(self) -> list:
+        """
+        Minimal coverability set: the markings not strictly covered by another one
+        """
+        markings = self.markings
+        return [m for m in markings
+                if not any(o != m and all(a >= b for a, b in zip(o, m)) for o in markings)]
+
+    def label(self, state: int) -> str:
+        """
+        State label in the form "[1.free, w.wait]"
+        """
+        return "[" + ", ".join("{0}.{1}".format("w" if h == OMEGA else h, name)
+                               for h, name in zip(self.markings[state], self.compiled.place_names) if h != 0) + "]"
+
+
+def coverability(net, pruned=False, max_states=None) -> CoverabilityGraph:
+    """
+    Build the Karp-Miller coverability graph from the initial marking.
+    A successor which covers one of its ancestors gets OMEGA in every place where it has more tokens.
+    Places with max_token are never accelerated: a marking only covers another one
+    if both hold the same tokens in all bounded places.
+    :net: PetriNet or CompiledNet object.
+    :pruned: Drop every new marking which is covered by a marking already found. The graph then
+             holds fewer states (edges into dropped markings are left out) but the same minimal
+             coverability set and bounds.
+    :max_states: Stop adding states once the graph holds that many.
+    """
+    compiled = as_compiled(net)
+    bounded = [p for p, c in enumerate(compiled.capacity) if c != -1]
+    unbounded = [p for p, c in enumerate(compiled.capacity) if c == -1]
+
+    def covers(big, small) -> bool:
+        return all(big[p] == small[p] for p in bounded) and all(big[p] >= small[p] for p in unbounded)
+
+    graph = CoverabilityGraph(compiled)
+    graph.add_state(compiled.initial, -1)
+    maximal = [compiled.initial]    # markings not covered by a later one, for pruning
+    stack = [0]
+
+    while stack:
+        state = stack.pop()
+        marking = graph.markings[state]
+        for t in compiled.enabled(marking):
+            successor = compiled.fire(t, marking)
+            # accelerate against the ancestors
+            ancestor = state
+            while ancestor != -1:
+                older = graph.markings[ancestor]
+                if older != successor and covers(successor, older):
+                    successor = tuple(OMEGA if h > o else h for h, o in zip(successor, older))
+                ancestor = graph.parent[ancestor]
+
+            target = graph.index.get(successor)
+            if target is None:
+                if pruned:
+                    if any(covers(m, successor) for m in maximal):
+                        continue
+                    maximal = [m for m in maximal if not covers(successor, m)]
+                    maximal.append(successor)
+                if max_states is not None and len(graph.markings) >= max_states:
+                    graph.truncated = True
+                    continue
+                target = graph.add_state(successor, state)
+                stack.append(target)
+            graph.edges.append((state, t, target))
+    return graph
@@ -0,0 +1,239 @@
+"""
+Compiled form of a petri net: places and transitions are numbered and
+markings are plain integer tuples, so firing never touches Place objects.
+"""
+from collections import OrderedDict
+
+
+class SuccessorCache:
+    def __init__(self, size=1 << 16):
+        """
+        Bounded LRU cache marking -> [(transition index, successor marking)] for one net structure.
+        :size: Maximum number of markings kept, the least recently used one is dropped first.
+        """
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, compiled, marking: tuple) -> list:
+        entries = self._entries
+        result = entries.get(marking)
+        if result is not None:
+            self.hits += 1
+            entries.move_to_end(marking)
+            return result
+        self.misses += 1
+        result = [(t, compiled.fire(t, marking)) for t in compiled.enabled(marking)]
+        entries[marking] = result
+        if len(entries) > self.size:
+            entries.popitem(last=False)
+        return result
+
+    def info(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": self.size, "entries": len(self._entries)}
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+class CompiledNet:
+    def __init__(self, place_names: list, capacity: list, transition_names: list,
+                 pre: list, post: list, initial=None):
+        """
+        Index based petri net.
+        :place_names: Names of the places, the position is the place index.
+        :capacity: Maximum tokens of every place (-1 for unbounded place).
+        :transition_names: Names of the transitions, the position is the transition index.
+        :pre: For every transition the (place index, weight) pairs of its input arcs.
+        :post: For every transition the (place index, weight) pairs of its output arcs.
+        :initial: Initial marking (all places empty if not given).
+        """
+        self.place_names = list(place_names)
+        self.capacity = tuple(capacity)
+        self.transition_names = list(transition_names)
+        self.pre = [tuple(arcs) for arcs in pre]
+        self.post = [tuple(arcs) for arcs in post]
+        self.initial = tuple(initial) if initial is not None else (0,) * len(self.place_names)
+        self.place_index = dict((name, i) for i, name in enumerate(self.place_names))
+        self.transition_index = dict((name, i) for i, name in enumerate(self.transition_names))
+
+        # transitions whose enabledness may change when t fires: those sharing a place with t
+        touching = [set() for _ in self.place_names]
+        for t, arcs in enumerate(zip(self.pre, self.post)):
+            for p, _ in arcs[0] + arcs[1]:
+                touching[p].add(t)
+        self.affected = [tuple(sorted(set().union(*[touching[p] for p, _ in arcs[0] + arcs[1]])))
+                         for arcs in zip(self.pre, self.post)]
+        self.cache = SuccessorCache()
+
+    @classmethod
+    def from_net(cls, net):
+        """
+        Compile a PetriNet object, its current markings become the initial marking.
+        :net: The petri net to compile.
+        """
+        place_names = list(net._places)
+        place_index = dict((name, i) for i, name in enumerate(place_names))
+        pre = []
+        post = []
+        for transition in net._transitions.values():
+            pre.append([(place_index[name], arc._weight) for name, arc in transition._inarcs.items()])
+            post.append([(place_index[name], arc._weight) for name, arc in transition._outarcs.items()])
+        return cls(place_names,
+                   [p._max_token for p in net._places.values()],
+                   list(net._transitions),
+                   pre, post,
+                   [p._holding for p in net._places.values()])
+
+    def __getstate__(self):
+        # the successor cache stays in this process
+        state = dict(self.__dict__)
+        state["cache"] = SuccessorCache(self.cache.size)
+        return state
+
+    def with_initial(self, marking) -> "CompiledNet":
+        """
+        The same compiled net (sharing its structure and successor cache) with another initial marking.
+        :marking: The initial marking.
+        """
+        compiled = CompiledNet.__new__(CompiledNet)
+        compiled.__dict__.update(self.__dict__)     # not copy.copy, which would drop the cache
+        compiled.initial = tuple(marking)
+        return compiled
+
+    def token_bounds(self, marking=None) -> list:
+        """
+        Most tokens every place can hold, -1 for an unbounded place.
+        A place receives the whole arc weight while it has room for one token,
+        so it can go up to max_token + (heaviest arc into it) - 1.
+        :marking: Marking the bounds hold from (the initial marking if not given).
+        """
+        marking = self.initial if marking is None else marking
+        heaviest = [1] * len(self.place_names)
+        for arcs in self.post:
+            for p, w in arcs:
+                heaviest[p] = max(heaviest[p], w)
+        return [-1 if c == -1 else max(h, c + w - 1) for c, w, h in zip(self.capacity, heaviest, marking)]
+
+    def pre_matrix(self) -> list:
+        """
+        Pre incidence matrix, one row per transition and one column per place.
+        """
+        return self._dense(self.pre)
+
+    def post_matrix(self) -> list:
+        """
+        Post incidence matrix, one row per transition and one column per place.
+        """
+        return self._dense(self.post)
+
+    def incidence_matrix(self) -> list:
+        """
+        Incidence matrix C = post - pre, one row per transition.
+        """
+        return [[b - a for a, b in zip(row_pre, row_post)]
+                for row_pre, row_post in zip(self.pre_matrix(), self.post_matrix())]
+
+    def _dense(self, arcs) -> list:
+        rows = []
+        for arc in arcs:
+            row = [0] * len(self.place_names)
+            for p, w in arc:
+                row[p] += w
+            rows.append(row)
+        return rows
+
+    def fireable(self, t: int, marking: tuple) -> bool:
+        """
+        Check whether transition t is fireable at the marking
+        (same rule as Transition.fireable).
+        :t: Transition index.
+        :marking: Marking tuple.
+        """
+        for p, w in self.pre[t]:
+            if marking[p] < w:
+                return False
+        capacity = self.capacity
+        for p, _ in self.post[t]:
+            if capacity[p] == -1 or marking[p] + 1 <= capacity[p]:
+                return True
+        return False
+
+    def enabled(self, marking: tuple) -> list:
+        """
+        Indices of all transitions fireable at the marking.
+        :marking: Marking tuple.
+        """
+        capacity = self.capacity
+        result = []
+        for t, (pre, post) in enumerate(zip(self.pre, self.post)):
+            for p, w in pre:
+                if marking[p] < w:
+                    break
+            else:
+                for p, _ in post:
+                    if capacity[p] == -1 or marking[p] + 1 <= capacity[p]:
+                        result.append(t)
+                        break
+        return result
+
+    def update_enabled(self, enabled: set, t: int, marking: tuple) -> set:
+        """
+        Update the enabled set after firing t, only the transitions sharing a place with t are rechecked.
+        :enabled: Set of enabled transition indices before firing t, updated in place and returned.
+        :t: The fired transition index.
+        :marking: Marking reached by firing t.
+        """
+        for u in self.affected[t]:
+            if self.fireable(u, marking):
+                enabled.add(u)
+            else:
+                enabled.discard(u)
+        return enabled
+
+    def fire(self, t: int, marking: tuple) -> tuple:
+        """
+        Marking reached by firing transition t (t must be fireable).
+        Output places which are full after consuming don't receive tokens,
+        like OutArc.produce.
+        :t: Transition index.
+        :marking: Marking tuple.
+        """
+        capacity = self.capacity
+        m = list(marking)
+        for p, w in self.pre[t]:
+            m[p] -= w
+        for p, w in self.post[t]:
+            if capacity[p] == -1 or m[p] + 1 <= capacity[p]:
+                m[p] += w
+        return tuple(m)
+
+    def successors(self, marking: tuple) -> list:
+        """
+        (transition index, successor marking) for every transition fireable at the marking,
+        memoized in the successor cache (see cache.info() for hits and misses).
+        :marking: Marking tuple.
+        """
+        return self.cache.get(self, marking)
+
+    def labels(self, marking: tuple, skip_zero=False) -> list:
+        """
+        Marking as a list of "tokens.place" strings.
+        :marking: Marking tuple.
+        :skip_zero: Leave out empty places.
+        """
+        return ["{0}.{1}".format(h, name) for h, name in zip(marking, self.place_names)
+                if h != 0 or not skip_zero]
+
+
+def as_compiled(net) -> CompiledNet:
+    """
+    Compiled form of a PetriNet (a CompiledNet is returned as it is).
+    :net: PetriNet or CompiledNet object.
+    """
+    if isinstance(net, CompiledNet):
+        return net
+    return net.compile()
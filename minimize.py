@@ -0,0 +1,262 @@
+"""
+Minimization of transition systems (reachability graphs) by partition refinement:
+strong bisimulation and trace equivalence, with labels hidden as tau
+"""
+TAU = "tau"
+
+
+class Quotient:
+    def __init__(self, labels: list, members: list, edges: list, names=None):
+        """
+        Minimized transition system, state 0 holds the initial state.
+        :labels: Label names, the position is the label index.
+        :members: For every state the states of the original graph it stands for.
+        :edges: (source, label index, target) without duplicates.
+        :names: Optional function original state -> display label.
+        """
+        self.labels = labels
+        self.members = members
+        self.edges = edges
+        self._names = names
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def transition_name(self, label: int) -> str:
+        return self.labels[label]
+
+    def label(self, state: int) -> str:
+        """
+        Labels of the original states the state stands for, separated by " | "
+        """
+        if self._names is None:
+            return "{" + ", ".join(str(s) for s in self.members[state]) + "}"
+        return " | ".join(self._names(s) for s in self.members[state])
+
+
+def _lts(graph, hidden):
+    """
+    (number of states, label names, edges (source, label index, target)) of a graph, hidden labels become TAU
+    """
+    names = graph.compiled.transition_names
+    hidden = set(hidden)
+    labels = []
+    index = {}
+    relabel = []
+    for name in names:
+        name = TAU if name in hidden else name
+        if name not in index:
+            index[name] = len(labels)
+            labels.append(name)
+        relabel.append(index[name])
+    return len(graph), labels, [(s, relabel[t], d) for s, t, d in graph.edges]
+
+
+def _refine(n: int, edges: list, blocks=None) -> list:
+    """
+    Coarsest strong bisimulation of a labelled transition system (Paige-Tarjan).
+    Splitters are taken from compound blocks of the previous partition, always the smaller half,
+    with per (state, label, splitter) counts for the three-way split, so every transition
+    is looked at O(log n) times.
+    :n: Number of states.
+    :edges: (source, label, target).
+    :blocks: Optional initial partition as a block number per state.
+    Returns the block number of every state.
+    """
+    incoming = [[] for _ in range(n)]      # target -> [(label, source)]
+    for s, a, d in edges:
+        incoming[d].append((a, s))
+
+    block_of = list(blocks) if blocks is not None else [0] * n
+    members = {}
+    for s, b in enumerate(block_of):
+        members.setdefault(b, set()).add(s)
+    next_block = max(members, default=-1) + 1
+    # X partition: every block is inside one splitter, splitters with several blocks are compound
+    splitter_of = dict((b, 0) for b in members)
+    splitters = {0: set(members)}
+    compound = [0] if len(members) > 1 else []
+
+    def split(marked) -> None:
+        """
+        Move the marked states of every block into a new block
+        """
+        nonlocal next_block
+        touched = {}
+        for s in marked:
+            touched.setdefault(block_of[s], []).append(s)
+        for b, moving in touched.items():
+            if len(moving) == len(members[b]):
+                continue
+            new = next_block
+            next_block += 1
+            members[new] = set(moving)
+            members[b].difference_update(moving)
+            for s in moving:
+                block_of[s] = new
+            x = splitter_of[b]
+            splitter_of[new] = x
+            splitters[x].add(new)
+            if len(splitters[x]) == 2:
+                compound.append(x)
+
+    # stable with respect to the whole state set: split by the labels each state can do
+    count = {}      # (state, label, splitter) -> number of transitions into the splitter
+    by_label = {}
+    for s, a, d in edges:
+        count[(s, a, 0)] = count.get((s, a, 0), 0) + 1
+        by_label.setdefault(a, set()).add(s)
+    for sources in by_label.values():
+        split(sources)
+
+    next_splitter = 1
+    while compound:
+        x = compound[-1]
+        if len(splitters[x]) < 2:
+            compound.pop()
+            continue
+        blocks_x = iter(splitters[x])
+        first, second = next(blocks_x), next(blocks_x)
+        b = first if len(members[first]) <= len(members[second]) else second
+        # b becomes a splitter of its own
+        splitters[x].discard(b)
+        if len(splitters[x]) < 2:
+            compound.pop()
+        y = next_splitter
+        next_splitter += 1
+        splitters[y] = {b}
+        splitter_of[b] = y
+
+        into = {}   # label -> [source] of the transitions into b
+        for d in members[b]:
+            for a, s in incoming[d]:
+                into.setdefault(a, []).append(s)
+        for a, sources in into.items():
+            local = {}
+            for s in sources:
+                local[s] = local.get(s, 0) + 1
+            # states reaching b, then among them those reaching x only through b
+            split(local)
+            split([s for s, k in local.items() if k == count[(s, a, x)]])
+            for s, k in local.items():
+                left = count[(s, a, x)] - k
+                if left:
+                    count[(s, a, x)] = left
+                else:
+                    del count[(s, a, x)]
+                count[(s, a, y)] = k
+
+    # number the blocks by their smallest state, so the initial state is in block 0
+    numbers = {}
+    for s in range(n):
+        numbers.setdefault(block_of[s], len(numbers))
+    return [numbers[b] for b in block_of]
+
+
+def _quotient(n: int, labels: list, edges: list, block_of: list, members=None, names=None) -> Quotient:
+    """
+    Quotient of a transition system under a partition
+    :members: For every state the original states it stands for (the state itself if not given).
+    """
+    size = max(block_of, default=-1) + 1
+    grouped = [[] for _ in range(size)]
+    for s in range(n):
+        grouped[block_of[s]].extend(members[s] if members is not None else [s])
+    for group in grouped:
+        group.sort()
+    edges = sorted(set((block_of[s], a, block_of[d]) for s, a, d in edges))
+    return Quotient(labels, grouped, edges, names)
+
+
+def _names(graph):
+    return graph.label if hasattr(graph, "label") else None
+
+
+def bisimulation(graph, hidden=()) -> Quotient:
+    """
+    Quotient of a reachability graph under strong bisimulation
+    :graph: ReachabilityGraph (or any graph with compiled, edges and len()).
+    :hidden: Names of the transitions shown as the invisible label TAU.
+    """
+    n, labels, edges = _lts(graph, hidden)
+    return _quotient(n, labels, edges, _refine(n, edges), names=_names(graph))
+
+
+def _determinize(n: int, labels: list, edges: list):
+    """
+    Subset construction over the visible labels, TAU moves are closed over.
+    Returns (subsets, deterministic edges).
+    """
+    tau = labels.index(TAU) if TAU in labels else -1
+    tau_next = [[] for _ in range(n)]
+    visible = [{} for _ in range(n)]
+    for s, a, d in edges:
+        if a == tau:
+            tau_next[s].append(d)
+        else:
+            visible[s].setdefault(a, []).append(d)
+
+    def closure(states) -> frozenset:
+        result = set(states)
+        stack = list(states)
+        while stack:
+            for d in tau_next[stack.pop()]:
+                if d not in result:
+                    result.add(d)
+                    stack.append(d)
+        return frozenset(result)
+
+    start = closure([0]) if n else frozenset()
+    subsets = [start]
+    index = {start: 0}
+    result = []
+    for i, subset in enumerate(subsets):
+        moves = {}
+        for s in subset:
+            for a, targets in visible[s].items():
+                moves.setdefault(a, set()).update(targets)
+        for a in sorted(moves):
+            target = closure(moves[a])
+            j = index.get(target)
+            if j is None:
+                j = len(subsets)
+                index[target] = j
+                subsets.append(target)
+            result.append((i, a, j))
+    return subsets, result
+
+
+def trace_equivalence(graph, hidden=()) -> Quotient:
+    """
+    Smallest deterministic transition system with the same (visible) traces as the reachability graph:
+    hidden transitions become TAU, TAU moves are closed over in a subset construction,
+    then the result is minimized (bisimulation of a deterministic system is trace equivalence).
+    The subset construction can grow exponentially in the worst case.
+    :graph: ReachabilityGraph (or any graph with compiled, edges and len()).
+    :hidden: Names of the transitions to hide.
+    """
+    n, labels, edges = _lts(graph, hidden)
+    subsets, det_edges = _determinize(n, labels, edges)
+    block_of = _refine(len(subsets), det_edges)
+    return _quotient(len(subsets), labels, det_edges, block_of,
+                     [sorted(subset) for subset in subsets], _names(graph))
+
+
+def equivalent(graph_a, graph_b, hidden=(), trace=False) -> bool:
+    """
+    Check whether the initial states of two reachability graphs are bisimilar
+    (or trace equivalent with trace=True). Transitions are matched by name.
+    """
+    n_a, labels_a, edges_a = _lts(graph_a, hidden)
+    n_b, labels_b, edges_b = _lts(graph_b, hidden)
+    labels = list(labels_a) + [name for name in labels_b if name not in labels_a]
+    index = dict((name, i) for i, name in enumerate(labels))
+    edges_b = [(s, index[labels_b[a]], d) for s, a, d in edges_b]
+    if trace:
+        subsets_a, edges_a = _determinize(n_a, labels, edges_a)
+        subsets_b, edges_b = _determinize(n_b, labels, edges_b)
+        n_a, n_b = len(subsets_a), len(subsets_b)
+    # disjoint union, the states of b come after those of a
+    edges = edges_a + [(s + n_a, a, d + n_a) for s, a, d in edges_b]
+    block_of = _refine(n_a + n_b, edges)
+    return block_of[0] == block_of[n_a]
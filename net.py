@@ -3,9 +3,15 @@ A Petri net simple implementation
 """
 import os
 import shutil
-import graphviz
+from engine import CompiledNet
+from reachability import ReachabilityGraph, explore
+from simulate import iter_concurrent
+from query import reachable, deadlock_free, can_fire
+from visualize import Renderer
 
 class Place:
+    __slots__ = ("_holding", "_max_token")
+
     def __init__(self, holding=0, max_token=-1):
         """
         Place object in Petri Net
@@ -29,6 +35,8 @@ class Place:
 
 
 class ArcBase:
+    __slots__ = ("_place", "_weight")
+
     def __init__(self, place, weight=1):
         """
         Arc object in Petri Net connecting place and transition.
@@ -40,6 +48,8 @@ class ArcBase:
 
 
 class OutArc(ArcBase):
+    __slots__ = ()
+
     def __init__(self, place, weight=1):
         """
         Directed arc from transition to output place.  
@@ -63,6 +73,8 @@ class OutArc(ArcBase):
 
 
 class InArc(ArcBase):
+    __slots__ = ()
+
     def __init__(self, place, weight=1):
         """
         Directed arc from input place to transition.
@@ -86,6 +98,8 @@ class InArc(ArcBase):
 
 
 class Transition:
+    __slots__ = ("_inarcs", "_outarcs")
+
     def __init__(self, places: list, inarc_indices: list, outarcs_indices: list):
         """
         Transitions in petri net
@@ -127,6 +141,7 @@ class PetriNet:
         """
         self._transitions = transitions
         self._places = places
+        self._compiled = None   # (structure signature, CompiledNet)
     
     def set_markings(self, markings: list) -> None:
         """
@@ -140,6 +155,39 @@ class PetriNet:
                 continue
             self._places[key]._holding = markings[i]
 
+    def get_markings(self) -> tuple:
+        """
+        Current markings of the places sequentially
+        """
+        return tuple(p._holding for p in self._places.values())
+
+    def _restore(self, markings) -> None:
+        """
+        Write markings (produced by the compiled net) back to the places
+        """
+        for place, holding in zip(self._places.values(), markings):
+            place._holding = holding
+
+    def _signature(self) -> tuple:
+        """
+        Everything the compiled net depends on except the markings: places, max_tokens, transitions and arcs
+        """
+        return (tuple((name, place._max_token) for name, place in self._places.items()),
+                tuple((name, tuple((p, arc._weight) for p, arc in transition._inarcs.items()),
+                       tuple((p, arc._weight) for p, arc in transition._outarcs.items()))
+                      for name, transition in self._transitions.items()))
+
+    def compile(self) -> CompiledNet:
+        """
+        Compiled (index based) form of the net with the current markings as initial marking.
+        The compiled structure and its successor cache are kept until the places, max_tokens,
+        transitions or arcs change.
+        """
+        signature = self._signature()
+        if self._compiled is None or self._compiled[0] != signature:
+            self._compiled = (signature, CompiledNet.from_net(self))
+        return self._compiled[1].with_initial(self.get_markings())
+
     def fsgenerate(self) -> list:
         """
         Firing sequence generator.
@@ -175,17 +223,26 @@ class PetriNet:
         :name: Name of the petri net
         :folder: Folder to store visualization
         """
-        root_folder = os.path.dirname(os.path.abspath(__file__))
-        visual_path = os.path.join(root_folder, "test-visualize")
+        visual_path = _visual_folder(folder)
         if os.path.exists(visual_path):
-            old_folder_path = os.path.join(visual_path, folder)
-            if os.path.exists(old_folder_path):
-                shutil.rmtree(old_folder_path)
-        self.draw(name, folder)
+            shutil.rmtree(visual_path)
         map_key = dict(enumerate(self._transitions.keys()))
-        print("Initial marking: [", ", ".join(["{0}.{1}".format(p[1]._holding, p[0]) for p in self._places.items()]), "]", sep="")
-        if not(any(transition.fireable() for transition in self._transitions.values())):
+        compiled = self.compile()
+        marking = compiled.initial
+        # one layout for the whole session, the drawings are rendered in the background
+        renderer = Renderer(compiled, visual_path, "png")
+
+        def draw(drawing):
+            renderer.submit(marking, drawing)
+            print("Petri net visualized!...")
+
+        draw(name)
+        # successors of the markings visited are kept in the compiled net's cache
+        enabled = dict(compiled.successors(marking))
+        print("Initial marking: [", ", ".join(compiled.labels(marking)), "]", sep="")
+        if not enabled:
             print("No enabled transition found!")
+            renderer.close()
             return
         choose_transition = ("Choose a firing transition (" + ", ".join(["{0} for '{1}'".format(*i) for i in map_key.items()])
                              +  ", {} to visualize, -1 to finish firing): ".format(len(self._transitions)))
@@ -195,156 +252,119 @@ class PetriNet:
         while i != -1:
             if i == len(self._transitions):
                 if count == 0:
-                    self.draw(name, folder)
+                    draw(name)
                 else:
-                    self.draw("_".join([name, str(count)]), folder)
+                    draw("_".join([name, str(count)]))
                 count += 1
                 i = int(input(choose_transition).strip())
                 continue
             key = map_key[i]
-            if self._transitions[key].fire():
+            if i in enabled:
+                marking = enabled[i]
+                enabled = dict(compiled.successors(marking))
+                self._restore(marking)
                 print("'{}' fired...".format(key))
-                print("\t ===>    [", ", ".join(["{0}.{1}".format(p[1]._holding, p[0]) for p in self._places.items()]), "]", sep="")
+                print("\t ===>    [", ", ".join(compiled.labels(marking)), "]", sep="")
             else:
                 print("'{}' is not enabled...".format(key))
-            if not(any(transition.fireable() for transition in self._transitions.values())):
+            if not enabled:
                 print("No more enabled transitions! Stop firing.")
                 v = input("Press 1 to visualize the final transition, else press 0: ")
                 if v == "1":
                     name = name[:-3] + "final"
-                    self.draw(name, folder)
+                    draw(name)
                 break
             i = int(input(choose_transition).strip())
 
-        print("\nEnd firing: [", ", ".join(["{0}.{1}".format(p[1]._holding, p[0]) for p in self._places.items()]), "]", sep="")
+        renderer.close()
+        print("\nEnd firing: [", ", ".join(compiled.labels(marking)), "]", sep="")
 
-    def run_concurrent(self) -> set:
+    def run_concurrent(self, backend="exact", stats=None) -> set:
         """
         Fire all available transitions concurrently in the net until none left
         Return all firing rules in the net
+        :backend: Store of visited markings, "exact" or "bitstate"
+        :stats: Optional RunStats (stats.py) collecting counters and timings of the firing
         """
-        print("Initial marking: [", ", ".join(["{0}.{1}".format(p[1]._holding, p[0]) for p in self._places.items()]), "]")
+        compiled = self.compile()
+        marking = compiled.initial
+        print("Initial marking: [", ", ".join(compiled.labels(marking)), "]")
 
-        markings_set = set()    # use to check whether loop contains in the net
-        markings_set.add(tuple(p._holding for p in self._places.values()))
-        firing_rules = set()    
-
-        while any(transition.fireable() for transition in self._transitions.values()):
-
-            print("(N, [", ", ".join(["{0}.{1}".format(p[1]._holding, p[0]) for p in self._places.items()]), "])", end="  ", sep="")
-            
-            s1 = []
-            for p in self._places.items():
-                if p[1]._holding != 0:
-                    s1.append(str(p[1]._holding) + "." + p[0])
-                
-            s2 = []
-            for key in self._transitions:
-                if self._transitions[key].fireable():
-                    s2.append(key)
-
-            # fire concurrently
-            for i in s2:
-                self._transitions[i].fire()
-
-            print("[", ", ".join(s2), ">", 
-                  "  (N, [", ", ".join(["{0}.{1}".format(p[1]._holding, p[0]) for p in self._places.items()]), "])", sep="")
-            
-            s3 = []
-            for p in self._places.items():
-                if p[1]._holding != 0:
-                    s3.append(str(p[1]._holding) + "." + p[0])
-            firing_rules.add(tuple([tuple(s1), tuple(s2), tuple(s3)]))
-            
-            # check whether contains loop in the nets
-            old_size = markings_set.__len__()
-            markings_set.add(tuple([p._holding for p in self._places.values()]))
-            if old_size == markings_set.__len__():
-                print("Loop detected! Terminate firing!")
-                print("\nEnd firing: [", ", ".join(["{0}.{1}".format(p[1]._holding, p[0]) for p in self._places.items()]), "]", sep="")
-                return firing_rules
-            
-        print("\nEnd firing: [", ", ".join(["{0}.{1}".format(p[1]._holding, p[0]) for p in self._places.items()]), "]", sep="")
+        firing_rules = set()
+        for before, s2, marking in iter_concurrent(compiled, backend=backend, stats=stats):
+            print("(N, [", ", ".join(compiled.labels(before)), "])", end="  ", sep="")
+            print("[", ", ".join(s2), ">",
+                  "  (N, [", ", ".join(compiled.labels(marking)), "])", sep="")
+
+            s1 = compiled.labels(before, skip_zero=True)
+            s3 = compiled.labels(marking, skip_zero=True)
+            firing_rules.add(tuple([tuple(s1), s2, tuple(s3)]))
+
+        # the run stops early only when a marking repeats
+        if compiled.enabled(marking):
+            print("Loop detected! Terminate firing!")
+        self._restore(marking)
+        print("\nEnd firing: [", ", ".join(compiled.labels(marking)), "]", sep="")
         return firing_rules
 
-    def run_sequent_rec(self, transition_keys, firing_rules) -> None:
-        """ 
-        Fire all available transitions sequentially in the net until none left
-        :transition_keys: all fireable transitions
-        :firing_rules: all firing rules in the net
-        """
-        for key in transition_keys:
-            reserve_markings = [p._holding for p in self._places.values()]   # reserve markings for recursion
-            
-            s1 = []
-            for p in self._places.items():
-                if p[1]._holding != 0:
-                    s1.append(str(p[1]._holding) + "." + p[0])
-        
-            s2 = [key]
-            # fire
-            self._transitions[key].fire()
-
-            s3 = []
-            for p in self._places.items():
-                if p[1]._holding != 0:
-                    s3.append(str(p[1]._holding) + "." + p[0])
-
-            old_size = firing_rules.__len__()
-            firing_rules.add(tuple([tuple(s1), tuple(s2), tuple(s3)]))
-            if old_size == firing_rules.__len__():
-                return
-
-            fireable_trans = []
-            for key in self._transitions:
-                if self._transitions[key].fireable():
-                    fireable_trans.append(key)
-            
-            for key in fireable_trans:
-                self.run_sequent_rec([key], firing_rules)
-
-            # restore markings
-            self.set_markings(reserve_markings)
-            
-        if not(any(transition.fireable() for transition in self._transitions.values())):
-            return
-        
-    def run_sequent(self) -> set:
+    def reachability_graph(self, order="bfs", max_states=None, max_depth=None, workers=None,
+                           reduction=None, visible=None, stats=None, cache=False) -> ReachabilityGraph:
+        """
+        Build the reachability graph from the current markings
+        :order: "bfs" or "dfs"
+        :max_states: Maximum number of states in the graph
+        :max_depth: Maximum number of firings from the current markings
+        :workers: Number of processes for a parallel bfs (0 for all cores)
+        :reduction: "stubborn" to explore only stubborn sets (keeps deadlocks)
+        :visible: Places whose markings the reduction must keep
+        :stats: Optional RunStats (stats.py) collecting counters and timings
+        :cache: Reuse (and fill) the successor cache of the compiled net
+        """
+        return explore(self, order, max_states, max_depth, workers, reduction, visible, stats, cache)
+
+    def run_sequent(self, stats=None, cache=False) -> set:
         """ 
         Fire all available transitions sequentially in the net until none left
         Return all firing rules in the net
+        :stats: Optional RunStats (stats.py) collecting counters and timings
+        :cache: Take the successors from the successor cache, only worth it when the graph fits in it
+                and the net is explored again
         """
-        fireable_trans = []
-        for key in self._transitions:
-            if self._transitions[key].fireable():
-                fireable_trans.append(key)
-        firing_rules = set()
-        self.run_sequent_rec(fireable_trans, firing_rules)
-        return firing_rules
+        return self.reachability_graph(stats=stats, cache=cache).firing_rules()
+
+    def reachable(self, predicate, max_states=None):
+        """
+        Shortest firing sequence from the current markings to a marking satisfying the predicate
+        (called with the tokens of the places in order), None if there is none
+        """
+        return reachable(self, predicate, max_states=max_states)
+
+    def deadlock_free(self, max_states=None):
+        """
+        (True, None) if no deadlock is reachable from the current markings,
+        else (False, shortest firing sequence to a deadlock)
+        """
+        return deadlock_free(self, max_states=max_states)
+
+    def can_fire(self, transition: str, max_states=None):
+        """
+        Shortest firing sequence after which the transition is enabled, None if it never is
+        """
+        return can_fire(self, transition, max_states=max_states)
 
-    def draw(self, name="petri_net", folder="visualize") -> None:
+    def draw(self, name="petri_net", folder="visualize", view=False, format="png") -> None:
         """
-        Use graphviz to visualize petri net
+        Visualize petri net with its current markings (the layout is cached per net structure)
         :name: Name of the visualization
         :folder: Folder containing visualization petri net
-        """
-        ptn = graphviz.Digraph(name, format="png")
-        ptn.attr(rankdir='LR')
-        ptn.attr('node', shape='circle', height='1.5', penwidth='3.0', fontname='Sans Not-Rotated 20', fontsize='20')
-        for place in self._places.items():
-            place_with_tokens = place[0] + "\n" + str(place[1]._holding)
-            ptn.node(place_with_tokens)
-        ptn.attr('node', shape='box', height='1.5', penwidth='3.0', fontname='Sans Not-Rotated 20', fontsize='20')
-        for transition in self._transitions.items():
-            ptn.node(transition[0])
-            for place_name in transition[1]._inarcs:
-                place_with_tokens = place_name + "\n" + str(self._places[place_name]._holding)
-                ptn.edge(place_with_tokens, transition[0], penwidth='3.0')
-            for place_name in transition[1]._outarcs:
-                place_with_tokens = place_name + "\n" + str(self._places[place_name]._holding)
-                ptn.edge(transition[0], place_with_tokens, penwidth='3.0')
-        root_folder = os.path.dirname(os.path.abspath(__file__))
-        ptn.render(os.path.join(root_folder, "test-visualize", folder, name), view=True)
+        :view: Open the drawing in the default viewer
+        :format: Output format ("png", "svg", ...), only a .dot file without the graphviz binaries
+        """
+        with Renderer(self.compile(), _visual_folder(folder), format, workers=1) as renderer:
+            path = renderer.submit(self.get_markings(), name).result()
+        if view:
+            import graphviz     # only needed for opening a viewer
+            graphviz.view(path)
         print("Petri net visualized!...")
 
     def detail_Print(self, nname = "a"):
@@ -370,38 +390,9 @@ class PetriNet:
 
     def __add__ (self, other):
         """
-        Operator overloading used to merge 2 petri net
+        Operator overloading used to merge 2 petri net (see compose)
         """
-        if len(self._transitions) == 0:
-            return other
-        elif len(other._transitions) == 0:
-            return self
-        m_places = self._places
-        m_transitions = self._transitions
-
-        for ts in other._transitions:
-            appear = False
-            if ts in m_transitions.keys():
-                appear = True
-            else:
-                m_transitions[ts] = other._transitions[ts]
-            for inplace in other._transitions[ts]._inarcs:
-                if inplace in m_places.keys():
-                    other._transitions[ts]._inarcs[inplace] = InArc(m_places[inplace])
-                else:
-                    m_places[inplace] = other._transitions[ts]._inarcs[inplace]._place
-            for outplace in other._transitions[ts]._outarcs:
-                if outplace in m_places.keys():
-                    other._transitions[ts]._outarcs[outplace] = OutArc(m_places[outplace])
-                else:
-                    m_places[outplace] = other._transitions[ts]._outarcs[outplace]._place
-            if appear:
-                m_transitions[ts]._inarcs.update(other._transitions[ts]._inarcs)
-                m_transitions[ts]._outarcs.update(other._transitions[ts]._outarcs)
-        
-        # construct new petri net
-        m_net = PetriNet(m_transitions, m_places)
-        return m_net
+        return compose(self, other)
 
     def result_firing_one(self):
         """
@@ -411,24 +402,64 @@ class PetriNet:
             print ("Empty petri net!")
             return
         print("Initial marking M0: [", ", ".join(["{0}.{1}".format(p[1]._holding, p[0]) for p in self._places.items()]), "]", sep="")
-        root_folder = os.path.dirname(os.path.abspath(__file__))
-        visual_path = os.path.join(root_folder, "test-visualize")
+        visual_path = _visual_folder("asm4")
         if os.path.exists(visual_path):
-            old_folder_path = os.path.join(visual_path, "asm4")
-            if os.path.exists(old_folder_path):
-                shutil.rmtree(old_folder_path)
-        self.draw("initial_marking", "asm4")
-        initial_marking = [place._holding for place in self._places.values()]
+            shutil.rmtree(visual_path)
+        compiled = self.compile()
+        renderer = Renderer(compiled, visual_path, "png")
+        renderer.submit(compiled.initial, "initial_marking")
+        print("Petri net visualized!...")
         check_exist_marking = False
-        for ts in self._transitions.items():
-            enabled = ts[1].fire()
-            if enabled:
-                print("(N, M0) [{0}> (N, [{1}])".format(ts[0], ", ".join(["{0}.{1}".format(p[1]._holding, p[0]) for p in self._places.items()])))
-                check_exist_marking = True
-                self.draw("transition_{}".format(ts[0]), "asm4")
-                self.set_markings(initial_marking)
+        for t, marking in compiled.successors(compiled.initial):
+            print("(N, M0) [{0}> (N, [{1}])".format(compiled.transition_names[t], ", ".join(compiled.labels(marking))))
+            check_exist_marking = True
+            renderer.submit(marking, "transition_{}".format(compiled.transition_names[t]))
+            print("Petri net visualized!...")
+        renderer.close()
         if check_exist_marking == False:
             print("No reachable marking exists!")
 
+
+def _visual_folder(folder: str) -> str:
+    """
+    Path of a visualization folder inside test-visualize
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "test-visualize", folder)
+
+
+def compose(*nets) -> PetriNet:
+    """
+    Merge petri nets into a new one, places and transitions with the same name are merged.
+    A merged place keeps the tokens and max_token of its first net, a merged transition gets
+    the arcs of all nets (a later net's arc replaces an earlier arc on the same place).
+    The nets themselves are not modified. Runs in one pass over all places and arcs.
+    :nets: The petri nets to merge.
+    """
+    places = {}         # name -> new Place
+    transitions = {}    # name -> ({input place name: weight}, {output place name: weight})
+    for net in nets:
+        for name, place in net._places.items():
+            if name not in places:
+                places[name] = Place(place._holding, place._max_token)
+        for name, transition in net._transitions.items():
+            inarcs, outarcs = transitions.setdefault(name, ({}, {}))
+            for arcs, merged in ((transition._inarcs, inarcs), (transition._outarcs, outarcs)):
+                for place_name, arc in arcs.items():
+                    if place_name not in places:
+                        places[place_name] = Place(arc._place._holding, arc._place._max_token)
+                    merged[place_name] = arc._weight
+
+    place_list = list(places.items())
+    index = dict((name, i) for i, name in enumerate(places))
+    m_transitions = {}
+    for name, (inarcs, outarcs) in transitions.items():
+        transition = Transition(place_list, [index[p] for p in inarcs], [index[p] for p in outarcs])
+        for arcs, weights in ((transition._inarcs, inarcs), (transition._outarcs, outarcs)):
+            for place_name, arc in arcs.items():
+                arc._weight = weights[place_name]
+        m_transitions[name] = transition
+    return PetriNet(m_transitions, places)
+
+
 if __name__ == "__main__":
     print("this is net.py")
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""
+PNML (Petri Net Markup Language) import and export of place/transition nets
+"""
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape, quoteattr
+from engine import CompiledNet, as_compiled
+
+PNML_NS = "http://www.pnml.org/version-2009/grammar/pnml"
+PTNET_TYPE = "http://www.pnml.org/version-2009/grammar/ptnet"
+
+
+def _local(tag: str) -> str:
+    """
+    Tag without its namespace
+    """
+    return tag.rsplit("}", 1)[-1]
+
+
+def _connect(arc, places, transitions, pre, post) -> bool:
+    """
+    Add the arc (source id, target id, weight) to pre or post, False if its ends aren't known (yet)
+    """
+    source, target, weight = arc
+    if source in places and target in transitions:
+        pre[transitions[target]].append((places[source], weight))
+    elif source in transitions and target in places:
+        post[transitions[source]].append((places[target], weight))
+    else:
+        return False
+    return True
+
+
+def load_pnml(path: str) -> CompiledNet:
+    """
+    Load the first net of a PNML file into a compiled net.
+    The file is parsed as a stream: every place, transition and arc element is dropped
+    once it has been read, so memory stays proportional to the net, not to the XML tree.
+    Place capacities are read from a <capacity> element inside the place (-1 if missing).
+    :path: File path.
+    """
+    place_names, capacity, initial = [], [], []
+    transition_names = []
+    pre, post = [], []              # per transition [(place index, weight)]
+    places, transitions = {}, {}    # PNML id -> index
+    arcs = []                       # arcs read before their place or transition
+    seen = {"place": set(), "transition": set()}    # names in use, per kind
+
+    stack = []      # open elements
+    node = None     # attributes of the place, transition or arc being read
+    text = None
+    with open(path, "rb") as f:
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            tag = _local(elem.tag)
+            if event == "start":
+                stack.append(elem)
+                if node is None and tag in ("place", "transition", "arc"):
+                    node = dict(elem.attrib, kind=tag)
+                continue
+            stack.pop()
+            if node is None:
+                if tag == "net":
+                    break   # only the first net
+                continue
+
+            if tag == "text":
+                text = (elem.text or "").strip()
+            elif tag == "name" and _local(stack[-1].tag) == node["kind"]:
+                node["name"], text = text, None
+            elif tag in ("initialMarking", "inscription", "capacity") and text:
+                node[tag], text = int(text), None
+            elif tag == node["kind"]:
+                name = node.get("name") or node["id"]
+                if tag == "arc":
+                    arc = (node["source"], node["target"], node.get("inscription", 1))
+                    if not _connect(arc, places, transitions, pre, post):
+                        arcs.append(arc)
+                elif tag == "place":
+                    places[node["id"]] = len(place_names)
+                    name = name if name not in seen[tag] else node["id"]
+                    seen[tag].add(name)
+                    place_names.append(name)
+                    capacity.append(node.get("capacity", -1))
+                    initial.append(node.get("initialMarking", 0))
+                else:
+                    transitions[node["id"]] = len(transition_names)
+                    name = name if name not in seen[tag] else node["id"]
+                    seen[tag].add(name)
+                    transition_names.append(name)
+                    pre.append([])
+                    post.append([])
+                node = None
+                # drop the finished element (it's the oldest child still held by its parent)
+                stack[-1].remove(elem)
+
+    for arc in arcs:
+        if not _connect(arc, places, transitions, pre, post):
+            raise ValueError("Arc from '{}' to '{}' doesn't connect a place and a transition".format(*arc[:2]))
+    return CompiledNet(place_names, capacity, transition_names, pre, post, initial)
+
+
+def save_pnml(net, path: str, name="net") -> None:
+    """
+    Write a net (PetriNet or CompiledNet) as a PNML place/transition net, element by element.
+    Capacities are written in a <toolspecific> element of the place.
+    :net: The petri net.
+    :path: File path.
+    :name: Id of the net in the file.
+    """
+    compiled = as_compiled(net)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<pnml xmlns={}>\n<net id={} type={}>\n<page id="page0">\n'.format(
+            quoteattr(PNML_NS), quoteattr(name), quoteattr(PTNET_TYPE)))
+        for p, place in enumerate(compiled.place_names):
+            f.write('<place id="p{}"><name><text>{}</text></name>'.format(p, escape(place)))
+            if compiled.initial[p]:
+                f.write("<initialMarking><text>{}</text></initialMarking>".format(compiled.initial[p]))
+            if compiled.capacity[p] != -1:
+                f.write('<toolspecific tool="labeled-petri-net" version="1"><capacity><text>{}</text></capacity>'
+                        '</toolspecific>'.format(compiled.capacity[p]))
+            f.write("</place>\n")
+        for t, transition in enumerate(compiled.transition_names):
+            f.write('<transition id="t{}"><name><text>{}</text></name></transition>\n'.format(t, escape(transition)))
+        arc = 0
+        for t in range(len(compiled.transition_names)):
+            for source, target, arcs in (("p{0}", "t{1}", compiled.pre[t]), ("t{1}", "p{0}", compiled.post[t])):
+                for p, w in arcs:
+                    f.write('<arc id="a{}" source="{}" target="{}">'.format(arc, source.format(p, t), target.format(p, t)))
+                    if w != 1:
+                        f.write("<inscription><text>{}</text></inscription>".format(w))
+                    f.write("</arc>\n")
+                    arc += 1
+        f.write("</page>\n</net>\n</pnml>\n")
@@ -0,0 +1,133 @@
+"""
+Reachability queries which stop at the first witness and return the firing sequence leading to it
+"""
+import heapq
+from collections import deque
+from engine import as_compiled
+from reduction import StubbornSets
+
+
+def _witness(compiled, parent: dict, marking: tuple) -> list:
+    """
+    Names of the transitions fired from the start to the marking
+    """
+    trace = []
+    while parent[marking] is not None:
+        marking, t = parent[marking]
+        trace.append(compiled.transition_names[t])
+    trace.reverse()
+    return trace
+
+
+def _bfs(compiled, goal, marking, max_states, stubborn=None):
+    """
+    Breadth-first search for a marking with goal(marking, enabled set), shortest witness or None.
+    Raises RuntimeError when max_states markings were visited without an answer.
+    """
+    marking = compiled.initial if marking is None else tuple(marking)
+    enabled = set(compiled.enabled(marking))
+    parent = {marking: None}    # marking -> (marking before, transition index)
+    frontier = deque([(marking, enabled)])
+    while frontier:
+        marking, enabled = frontier.popleft()
+        if goal(marking, enabled):
+            return _witness(compiled, parent, marking)
+        transitions = stubborn.reduce(marking, enabled) if stubborn is not None else sorted(enabled)
+        for t in transitions:
+            successor = compiled.fire(t, marking)
+            if successor in parent:
+                continue
+            if max_states is not None and len(parent) >= max_states:
+                raise RuntimeError("No answer within {} markings".format(max_states))
+            parent[successor] = (marking, t)
+            frontier.append((successor, compiled.update_enabled(set(enabled), t, successor)))
+    return None
+
+
+def reachable(net, predicate, marking=None, max_states=None):
+    """
+    Shortest firing sequence to a marking satisfying the predicate, None if there is none.
+    :net: PetriNet or CompiledNet object.
+    :predicate: Called with a marking (tuple of tokens in the order of the places), returns bool.
+    :marking: Marking to start from (the initial marking if not given).
+    :max_states: Give up (RuntimeError) after visiting that many markings.
+    """
+    compiled = as_compiled(net)
+    return _bfs(compiled, lambda m, enabled: predicate(m), marking, max_states)
+
+
+def reachable_marking(net, target: dict, marking=None, max_states=None):
+    """
+    Shortest firing sequence to a marking with the tokens of target, None if there is none.
+    The search is A*, guided by the token distance to the target divided by
+    the most a single firing changes it, which never overestimates the firings left.
+    :net: PetriNet or CompiledNet object.
+    :target: {place name: tokens}, places not listed may hold any number of tokens.
+    :marking: Marking to start from (the initial marking if not given).
+    :max_states: Give up (RuntimeError) after visiting that many markings.
+    """
+    compiled = as_compiled(net)
+    wanted = [(compiled.place_index[name], tokens) for name, tokens in target.items()]
+    places = set(p for p, _ in wanted)
+    step = max([sum(w for p, w in compiled.pre[t] if p in places) + sum(w for p, w in compiled.post[t] if p in places)
+                for t in range(len(compiled.transition_names))] or [0]) or 1
+
+    def distance(m) -> int:
+        return -(-sum(abs(m[p] - tokens) for p, tokens in wanted) // step)
+
+    marking = compiled.initial if marking is None else tuple(marking)
+    parent = {marking: None}
+    depth = {marking: 0}
+    order = 0       # tie breaker, keeps the heap from comparing markings
+    frontier = [(distance(marking), order, marking)]
+    closed = set()
+    while frontier:
+        _, _, marking = heapq.heappop(frontier)
+        if marking in closed:
+            continue
+        closed.add(marking)
+        if all(marking[p] == tokens for p, tokens in wanted):
+            return _witness(compiled, parent, marking)
+        for t in compiled.enabled(marking):
+            successor = compiled.fire(t, marking)
+            g = depth[marking] + 1
+            if successor in closed or depth.get(successor, g + 1) <= g:
+                continue
+            if successor not in parent and max_states is not None and len(parent) >= max_states:
+                raise RuntimeError("No answer within {} markings".format(max_states))
+            parent[successor] = (marking, t)
+            depth[successor] = g
+            order += 1
+            heapq.heappush(frontier, (g + distance(successor), order, successor))
+    return None
+
+
+def deadlock_free(net, marking=None, max_states=None, reduction=None):
+    """
+    Check that every reachable marking enables a transition.
+    Returns (True, None), or (False, shortest firing sequence to a deadlock).
+    :net: PetriNet or CompiledNet object.
+    :marking: Marking to start from (the initial marking if not given).
+    :max_states: Give up (RuntimeError) after visiting that many markings.
+    :reduction: "stubborn" to fire only stubborn sets, which keeps every deadlock
+                but the witness may no longer be the shortest one.
+    """
+    if reduction not in (None, "stubborn"):
+        raise ValueError("Unknown reduction '{}'".format(reduction))
+    compiled = as_compiled(net)
+    stubborn = StubbornSets(compiled) if reduction is not None else None
+    witness = _bfs(compiled, lambda m, enabled: not enabled, marking, max_states, stubborn)
+    return witness is None, witness
+
+
+def can_fire(net, transition: str, marking=None, max_states=None):
+    """
+    Shortest firing sequence to a marking where the transition is enabled, None if it never is
+    :net: PetriNet or CompiledNet object.
+    :transition: Name of the transition.
+    :marking: Marking to start from (the initial marking if not given).
+    :max_states: Give up (RuntimeError) after visiting that many markings.
+    """
+    compiled = as_compiled(net)
+    t = compiled.transition_index[transition]
+    return _bfs(compiled, lambda m, enabled: t in enabled, marking, max_states)
@@ -0,0 +1,391 @@
+"""
+Iterative reachability graph builder over compiled petri nets
+"""
+import os
+from collections import deque
+import multiprocessing
+from engine import as_compiled
+from reduction import StubbornSets
+from store import make_store
+
+
+class ReachabilityGraph:
+    def __init__(self, compiled):
+        """
+        Reachability graph (transition system) of a petri net.
+        States are numbered in the order they are discovered, state 0 is the initial marking.
+        :compiled: The CompiledNet the graph is built from.
+        """
+        self.compiled = compiled
+        self.markings = []      # state id -> marking
+        self.index = {}         # marking -> state id
+        self.edges = []         # (source id, transition index, target id)
+        self._out = []          # state id -> [(transition index, target id)]
+        self.truncated = False  # True if a state or depth limit cut the exploration
+
+    def __len__(self) -> int:
+        return len(self.markings)
+
+    def add_state(self, marking: tuple) -> int:
+        """
+        Add a new state and return its id
+        :marking: Marking of the state.
+        """
+        state = len(self.markings)
+        self.markings.append(marking)
+        self.index[marking] = state
+        self._out.append([])
+        return state
+
+    def add_edge(self, source: int, t: int, target: int) -> None:
+        """
+        Add an edge labelled by transition t
+        """
+        self.edges.append((source, t, target))
+        self._out[source].append((t, target))
+
+    def successors(self, state: int) -> list:
+        """
+        The (transition index, target id) pairs leaving the state
+        """
+        return self._out[state]
+
+    def deadlocks(self) -> list:
+        """
+        Ids of the states without outgoing edges
+        """
+        return [s for s in range(len(self.markings)) if not self._out[s]]
+
+    def label(self, state: int) -> str:
+        """
+        State label in the form "[1.free, 1.busy]"
+        """
+        return "[" + ", ".join(self.compiled.labels(self.markings[state], skip_zero=True)) + "]"
+
+    def transition_name(self, t: int) -> str:
+        return self.compiled.transition_names[t]
+
+    def firing_rules(self) -> set:
+        """
+        Edges as firing rules ((tokens before), (transition,), (tokens after)), the format of run_sequent
+        """
+        labels = self.compiled.labels
+        names = self.compiled.transition_names
+        return set((tuple(labels(self.markings[s], skip_zero=True)),
+                    (names[t],),
+                    tuple(labels(self.markings[d], skip_zero=True))) for s, t, d in self.edges)
+
+
+def explore(net, order="bfs", max_states=None, max_depth=None, workers=None,
+            reduction=None, visible=None, stats=None, cache=False) -> ReachabilityGraph:
+    """
+    Build the reachability graph from the initial marking without recursion.
+    :net: PetriNet or CompiledNet object.
+    :order: "bfs" (queue) or "dfs" (stack).
+    :max_states: Stop adding states once the graph holds that many.
+    :max_depth: Don't expand states deeper than that many firings (depth along the exploration order).
+    :workers: Number of worker processes (bfs only), each owns the markings of its hash partition;
+              the graph is the same as the sequential one. Successors cross processes pickled,
+              so it only pays off with as many free cores as workers.
+    :reduction: None for the full graph or "stubborn" to fire only the transitions of a stubborn set
+                (the graph keeps all deadlocks, but not all states).
+    :visible: With reduction, names of the places whose reachable markings must be kept too.
+    :stats: Optional RunStats collecting counters and timings (with workers, the counters of the worker
+            processes are added up, their timings are left out).
+    :cache: Take the successors of every marking from the compiled net's successor cache, so exploring
+            the same net again (or after queries on it) doesn't fire the cached markings again.
+    """
+    if order not in ("bfs", "dfs"):
+        raise ValueError("Unknown exploration order '{}'".format(order))
+    if reduction not in (None, "stubborn"):
+        raise ValueError("Unknown reduction '{}'".format(reduction))
+    compiled = as_compiled(net)
+    if workers is not None and workers != 1:
+        if order != "bfs" or reduction is not None:
+            raise ValueError("Parallel exploration only supports full bfs")
+        return _explore_parallel(compiled, max_states, max_depth, workers or os.cpu_count(), stats)
+    graph = ReachabilityGraph(compiled)
+    lookup = graph.index.get
+    if stats is not None:
+        compiled = stats.instrument(compiled)
+        lookup = stats.timed("hashing", lookup)
+    stubborn = StubbornSets(compiled, visible) if reduction is not None else None
+    graph.add_state(compiled.initial)
+    # frontier items carry the enabled set so successors only recheck affected transitions
+    frontier = deque([(0, 0, None if cache else set(compiled.enabled(compiled.initial)))])
+    pop = frontier.popleft if order == "bfs" else frontier.pop
+
+    while frontier:
+        state, depth, enabled = pop()
+        if stats is not None:
+            stats.expand(len(frontier), len(graph.markings))
+        marking = graph.markings[state]
+        if cache:
+            successor_of = dict(compiled.successors(marking))
+            enabled = successor_of.keys()
+        if max_depth is not None and depth >= max_depth:
+            if enabled:
+                graph.truncated = True
+            continue
+        transitions = sorted(enabled)
+        if stubborn is not None:
+            reduced = stubborn.reduce(marking, enabled)
+            # proviso for visible places: a reduced step must not close a cycle,
+            # or the transitions left out could be ignored forever
+            if stubborn.visible is None or all(compiled.fire(t, marking) not in graph.index for t in reduced):
+                transitions = reduced
+        for t in transitions:
+            successor = successor_of[t] if cache else compiled.fire(t, marking)
+            target = lookup(successor)
+            if target is None:
+                if max_states is not None and len(graph.markings) >= max_states:
+                    graph.truncated = True
+                    continue
+                target = graph.add_state(successor)
+                frontier.append((target, depth + 1,
+                                 None if cache else compiled.update_enabled(set(enabled), t, successor)))
+            graph.add_edge(state, t, target)
+    if stats is not None:
+        stats.stop(len(graph.markings))
+    return graph
+
+
+def reduction_report(net, visible=None) -> dict:
+    """
+    Compare the full reachability graph with the stubborn set reduced one
+    :net: PetriNet or CompiledNet object.
+    :visible: Names of the places whose reachable markings must be kept.
+    """
+    full = explore(net)
+    reduced = explore(net, reduction="stubborn", visible=visible)
+    deadlocks = set(full.markings[s] for s in full.deadlocks())
+    return dict(states=len(full), reduced_states=len(reduced),
+                edges=len(full.edges), reduced_edges=len(reduced.edges),
+                ratio=len(reduced) / len(full),
+                deadlocks=len(deadlocks),
+                deadlocks_kept=deadlocks == set(reduced.markings[s] for s in reduced.deadlocks()))
+
+
+class _Mailbox:
+    def __init__(self, queue):
+        """
+        Inbox of a worker process: messages are (kind, level, payload), those asked for later are kept
+        """
+        self.queue = queue
+        self.kept = []
+
+    def receive(self, kind: str, level=None):
+        for i, message in enumerate(self.kept):
+            if message[0] == kind and (level is None or message[1] == level):
+                return self.kept.pop(i)
+        while True:
+            message = self.queue.get()
+            if message[0] == kind and (level is None or message[1] == level):
+                return message
+            self.kept.append(message)
+
+
+def _owner(compiled, me: int, inboxes: list, results) -> None:
+    """
+    Worker process owning the markings whose hash falls in its partition: it keeps their visited set,
+    expands them and sends every successor to the worker owning it. New states get their ids from
+    the main process, which only sees the (source, transition) of their first discovery.
+    """
+    workers = len(inboxes)
+    inbox = _Mailbox(inboxes[me])
+    visited = {}        # owned marking -> state id
+    owned = []          # (state id, marking)
+    edges = []          # (source id, transition index, target id) of the edges into owned states
+    frontier = []       # (state id, marking) of the level to expand, in id order
+    fires = [0] * len(compiled.transition_names)
+    expanded = 0
+    if hash(compiled.initial) % workers == me:
+        visited[compiled.initial] = 0
+        owned.append((0, compiled.initial))
+        frontier.append((0, compiled.initial))
+
+    while True:
+        _, level, command = inbox.receive("command")
+        if command == "enabled":
+            results.put(any(compiled.enabled(m) for _, m in frontier))
+            continue
+        if command == "collect":
+            results.put((owned, edges, fires, expanded))
+            return
+
+        batches = [[] for _ in range(workers)]
+        for state, marking in frontier:
+            expanded += 1
+            for t in compiled.enabled(marking):
+                successor = compiled.fire(t, marking)
+                fires[t] += 1
+                batches[hash(successor) % workers].append((successor, state, t))
+        for j, batch in enumerate(batches):
+            if j != me:
+                inboxes[j].put(("batch", level, batch))
+
+        first = {}      # new marking -> (source id, transition) of its first discovery in bfs order
+        pending = []
+        received = [batches[me]] + [inbox.receive("batch", level)[2] for _ in range(workers - 1)]
+        for batch in received:
+            for successor, state, t in batch:
+                target = visited.get(successor)
+                if target is not None:
+                    edges.append((state, t, target))
+                    continue
+                if successor not in first or (state, t) < first[successor]:
+                    first[successor] = (state, t)
+                pending.append((state, t, successor))
+        order = sorted(first, key=first.get)
+        results.put((me, [first[m] for m in order]))
+
+        ids = inbox.receive("ids", level)[2]
+        frontier = []
+        for marking, state in zip(order, ids):
+            if state is not None:
+                visited[marking] = state
+                owned.append((state, marking))
+                frontier.append((state, marking))
+        frontier.sort()
+        for state, t, successor in pending:
+            target = visited.get(successor)
+            if target is not None:      # states past max_states are left out
+                edges.append((state, t, target))
+
+
+def _explore_parallel(compiled, max_states, max_depth, workers, stats=None) -> ReachabilityGraph:
+    """
+    Level by level bfs over worker processes which own the markings by hash (visited set, expansion).
+    Per level the main process only numbers the new states: sorting them by their first discovery
+    (source id, transition) gives the ids of the sequential bfs, so the graph is the same.
+    """
+    if stats is not None:
+        stats.instrument(compiled)
+    inboxes = [multiprocessing.Queue() for _ in range(workers)]
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_owner, args=(compiled, me, inboxes, results), daemon=True)
+                 for me in range(workers)]
+    for process in processes:
+        process.start()
+    truncated = False
+    count = 1
+    level = 0
+    try:
+        while True:
+            if max_depth is not None and level >= max_depth:
+                for inbox in inboxes:
+                    inbox.put(("command", level, "enabled"))
+                enabled = [results.get() for _ in range(workers)]
+                truncated = truncated or any(enabled)
+                break
+            for inbox in inboxes:
+                inbox.put(("command", level, "expand"))
+            keys = dict(results.get() for _ in range(workers))     # worker -> first discoveries of its new states
+            ids = [[None] * len(keys[w]) for w in range(workers)]
+            for _, w, i in sorted((key, w, i) for w in range(workers) for i, key in enumerate(keys[w])):
+                if max_states is not None and count >= max_states:
+                    truncated = True
+                    break
+                ids[w][i] = count
+                count += 1
+            for w, inbox in enumerate(inboxes):
+                inbox.put(("ids", level, ids[w]))
+            level += 1
+            if not any(state is not None for part in ids for state in part):
+                break
+        for inbox in inboxes:
+            inbox.put(("command", level, "collect"))
+        parts = [results.get() for _ in range(workers)]
+    finally:
+        for process in processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+
+    markings = [None] * count
+    edges = []
+    for owned, owned_edges, fires, expanded in parts:
+        for state, marking in owned:
+            markings[state] = marking
+        edges += owned_edges
+        if stats is not None:
+            for t, n in enumerate(fires):
+                stats.fires[t] += n
+                stats.checks[t] += expanded
+            stats.expanded += expanded
+    edges.sort()
+    graph = ReachabilityGraph(compiled)
+    for marking in markings:
+        graph.add_state(marking)
+    for edge in edges:
+        graph.add_edge(*edge)
+    graph.truncated = truncated
+    if stats is not None:
+        stats.stop(len(graph.markings))
+    return graph
+
+
+def _search(compiled, order, store, max_states, max_depth):
+    """
+    Explore with a visited-state store and a frontier of packed markings.
+    Yields (marking before, transition index, marking after, after is a new state).
+    """
+    if order not in ("bfs", "dfs"):
+        raise ValueError("Unknown exploration order '{}'".format(order))
+    packer = store.packer
+    store.add(compiled.initial)
+    frontier = deque([(packer.pack(compiled.initial), 0)])
+    pop = frontier.popleft if order == "bfs" else frontier.pop
+
+    while frontier:
+        data, depth = pop()
+        if max_depth is not None and depth >= max_depth:
+            continue
+        marking = packer.unpack(data)
+        for t in compiled.enabled(marking):
+            successor = compiled.fire(t, marking)
+            if max_states is None or len(store) < max_states:
+                new = store.add(successor)
+            elif successor in store:
+                new = False
+            else:
+                continue
+            if new:
+                frontier.append((packer.pack(successor), depth + 1))
+            yield marking, t, successor, new
+
+
+def iter_firings(net, order="bfs", backend="exact", memory=1 << 24, max_states=None, max_depth=None):
+    """
+    Lazily yield every firing (marking before, transition name, marking after) of the reachability graph.
+    Only the frontier (packed markings) and the visited-state store are kept,
+    the consumer can write the firings away, aggregate them or stop at any time.
+    :net: PetriNet or CompiledNet object.
+    :order: "bfs" or "dfs".
+    :backend: Visited-state store, "exact" or "bitstate" (fixed memory, may miss states).
+    :memory: Bit array size in bytes for the bitstate backend.
+    :max_states: Maximum number of visited markings.
+    :max_depth: Don't expand markings deeper than that many firings.
+    """
+    compiled = as_compiled(net)
+    names = compiled.transition_names
+    for before, t, after, _ in _search(compiled, order, make_store(compiled, backend, memory), max_states, max_depth):
+        yield before, names[t], after
+
+
+def count_states(net, backend="exact", memory=1 << 24, order="bfs", max_states=None) -> int:
+    """
+    Count the reachable markings without building the graph.
+    Visited markings live in a store from store.py and the frontier holds packed markings,
+    so the bitstate backend explores within a fixed memory budget (and may miss states).
+    :net: PetriNet or CompiledNet object.
+    :backend: "exact" or "bitstate".
+    :memory: Bit array size in bytes for the bitstate backend.
+    :order: "bfs" or "dfs".
+    :max_states: Stop after visiting that many markings.
+    """
+    compiled = as_compiled(net)
+    store = make_store(compiled, backend, memory)
+    for _ in _search(compiled, order, store, max_states, None):
+        pass
+    return len(store)
@@ -0,0 +1,75 @@
+"""
+Partial-order reduction: stubborn sets computed on the transition-place structure
+"""
+
+
+class StubbornSets:
+    def __init__(self, compiled, visible=None):
+        """
+        Stubborn set chooser for a compiled net. Exploring only the enabled transitions of a
+        stubborn set keeps every deadlock reachable; with visible places, the markings of those
+        places are kept too (with the proviso applied by the explorer).
+        :compiled: The CompiledNet.
+        :visible: Names of the places a reachability property looks at (None for deadlocks only).
+        """
+        self.compiled = compiled
+        n_places = len(compiled.place_names)
+        self.producers = [[] for _ in range(n_places)]  # transitions which may add tokens to a place
+        self.consumers = [[] for _ in range(n_places)]  # transitions which remove tokens from a place
+        for t, (pre, post) in enumerate(zip(compiled.pre, compiled.post)):
+            for p, _ in pre:
+                self.consumers[p].append(t)
+            for p, _ in post:
+                self.producers[p].append(t)
+        self.visible = None
+        if visible is not None:
+            places = set(compiled.place_index[name] for name in visible)
+            self.visible = set(t for t, (pre, post) in enumerate(zip(compiled.pre, compiled.post))
+                               if any(p in places for p, _ in pre + post))
+
+    def _scapegoat(self, t: int, marking: tuple) -> list:
+        """
+        Transitions which have to fire before the disabled transition t can become enabled
+        """
+        compiled = self.compiled
+        for p, w in compiled.pre[t]:
+            if marking[p] < w:
+                return self.producers[p]
+        # all inputs hold enough tokens, so every output place is full:
+        # room in any of them enables t
+        return sorted(set(u for p, _ in compiled.post[t] for u in self.consumers[p]))
+
+    def _closure(self, seed: int, marking: tuple, enabled) -> set:
+        stubborn = {seed}
+        work = [seed]
+        visible_added = self.visible is None
+        while work:
+            t = work.pop()
+            if t in enabled:
+                # enabled: everything sharing a place with t may interfere with it
+                dependent = self.compiled.affected[t]
+                if not visible_added and t in self.visible:
+                    dependent = list(dependent) + list(self.visible)
+                    visible_added = True
+            else:
+                dependent = self._scapegoat(t, marking)
+            for u in dependent:
+                if u not in stubborn:
+                    stubborn.add(u)
+                    work.append(u)
+        return stubborn
+
+    def reduce(self, marking: tuple, enabled) -> list:
+        """
+        Enabled transitions of the smallest stubborn set found, trying every enabled transition as seed
+        :marking: The marking.
+        :enabled: Set of enabled transition indices at the marking.
+        """
+        best = None
+        for seed in sorted(enabled):
+            chosen = sorted(t for t in self._closure(seed, marking, enabled) if t in enabled)
+            if best is None or len(chosen) < len(best):
+                best = chosen
+                if len(best) == 1:
+                    break
+        return best or []
@@ -0,0 +1,318 @@
+"""
+Headless simulation of petri nets: no input(), print() or graphviz on the firing path
+"""
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from engine import as_compiled
+from steps import StepSemantics
+from store import make_store
+
+
+class SimulationResult:
+    def __init__(self, compiled, initial, final, trace, markings, deadlock):
+        """
+        Outcome of a simulation.
+        :compiled: The CompiledNet simulated.
+        :initial: Marking the simulation started from.
+        :final: Marking the simulation ended in.
+        :trace: Indices of the fired transitions in order.
+        :markings: Marking after every firing (None if not recorded).
+        :deadlock: True if the simulation stopped because no transition was enabled.
+        """
+        self.compiled = compiled
+        self.initial = initial
+        self.final = final
+        self.trace = trace
+        self.markings = markings
+        self.deadlock = deadlock
+
+    def __len__(self) -> int:
+        return len(self.trace)
+
+    def transition_names(self) -> list:
+        """
+        Names of the fired transitions in order
+        """
+        names = self.compiled.transition_names
+        return [names[t] for t in self.trace]
+
+
+def _policy(policy, seed):
+    """
+    Transition chooser: function (enabled set, marking) -> transition index
+    """
+    if callable(policy):
+        return policy
+    if policy == "first":
+        return lambda enabled, marking: min(enabled)
+    if policy == "random":
+        choice = random.Random(seed).choice
+        return lambda enabled, marking: choice(sorted(enabled))
+    raise ValueError("Unknown policy '{}'".format(policy))
+
+
+def simulate(net, steps: int, policy="first", seed=None, marking=None, record=True, on_step=None,
+             stats=None) -> SimulationResult:
+    """
+    Fire up to steps transitions chosen by a policy, stop early on deadlock.
+    :net: PetriNet or CompiledNet object.
+    :steps: Maximum number of firings.
+    :policy: "first" (lowest transition index), "random", or a function (enabled set, marking) -> transition index.
+    :seed: Seed of the random policy.
+    :marking: Marking to start from (the initial marking if not given).
+    :record: Keep the marking after every firing.
+    :on_step: Optional callback (step, transition index, marking) called after every firing.
+    :stats: Optional RunStats collecting counters and timings.
+    """
+    compiled = as_compiled(net)
+    calls = compiled
+    if stats is not None:
+        calls = stats.instrument(compiled)
+        if on_step is not None:
+            on_step = stats.timed("callbacks", on_step)
+    choose = _policy(policy, seed)
+    fire = calls.fire
+    update = calls.update_enabled
+    marking = compiled.initial if marking is None else tuple(marking)
+    initial = marking
+    enabled = set(calls.enabled(marking))
+    trace = []
+    markings = [] if record else None
+
+    for step in range(steps):
+        if not enabled:
+            break
+        if stats is not None:
+            stats.expand(0, step + 1)
+        t = choose(enabled, marking)
+        marking = fire(t, marking)
+        update(enabled, t, marking)
+        trace.append(t)
+        if record:
+            markings.append(marking)
+        if on_step is not None:
+            on_step(step, t, marking)
+    if stats is not None:
+        stats.stop()
+    return SimulationResult(compiled, initial, marking, trace, markings, not enabled)
+
+
+def replay(net, sequence, marking=None, record=True, on_step=None) -> SimulationResult:
+    """
+    Fire a firing sequence, transitions which are not enabled are skipped (like PetriNet.run).
+    :net: PetriNet or CompiledNet object.
+    :sequence: Transition names or indices.
+    :marking: Marking to start from (the initial marking if not given).
+    :record: Keep the marking after every firing.
+    :on_step: Optional callback (step, transition index, marking) called after every firing.
+    """
+    compiled = as_compiled(net)
+    index = compiled.transition_index
+    fire = compiled.fire
+    fireable = compiled.fireable
+    marking = compiled.initial if marking is None else tuple(marking)
+    initial = marking
+    trace = []
+    markings = [] if record else None
+
+    for step, t in enumerate(sequence):
+        if not isinstance(t, int):
+            t = index[t]
+        if not fireable(t, marking):
+            continue
+        marking = fire(t, marking)
+        trace.append(t)
+        if record:
+            markings.append(marking)
+        if on_step is not None:
+            on_step(step, t, marking)
+    return SimulationResult(compiled, initial, marking, trace, markings, not compiled.enabled(marking))
+
+
+def iter_concurrent(net, marking=None, backend="exact", stats=None, policy="greedy", seed=None):
+    """
+    Lazily yield the steps (marking before, fired transition names, marking after) of a concurrent run:
+    every step fires a maximal conflict-free set of enabled transitions as one update (steps.py).
+    Stops when no transition is enabled or when a marking repeats (loop).
+    :net: PetriNet or CompiledNet object.
+    :marking: Marking to start from (the initial marking if not given).
+    :backend: Store of visited markings, "exact" or "bitstate".
+    :stats: Optional RunStats collecting counters and timings (the time the consumer takes is left out).
+    :policy: How transitions competing for tokens are chosen, see StepSemantics.step.
+    :seed: Seed of the random policy.
+    """
+    compiled = as_compiled(net)
+    names = compiled.transition_names
+    marking = compiled.initial if marking is None else tuple(marking)
+    visited = make_store(compiled, backend, marking=marking)
+    add = visited.add
+    if stats is not None:
+        compiled = stats.instrument(compiled)
+        add = stats.timed("hashing", add)
+    semantics = StepSemantics(compiled)
+    fire = semantics.fire
+    if stats is not None:
+        fire = stats.timed("firing", fire)
+    rng = random.Random(seed)
+    add(marking)
+    enabled = set(compiled.enabled(marking))
+
+    while enabled:
+        if stats is not None:
+            stats.expand(0, len(visited))
+        before = marking
+        step = semantics.step(marking, enabled, policy, rng)
+        marking = fire(step, marking)
+        if stats is not None:
+            for t in step:
+                stats.fires[t] += 1
+            stats.stop(len(visited))
+        yield before, tuple(names[t] for t in step), marking
+        if stats is not None:
+            stats.start()
+        if not add(marking):
+            break
+        # only the transitions sharing a place with the step may change
+        for u in set(u for t in step for u in compiled.affected[t]):
+            if compiled.fireable(u, marking):
+                enabled.add(u)
+            else:
+                enabled.discard(u)
+    if stats is not None:
+        stats.stop(len(visited))
+
+
+class MonteCarloStats:
+    def __init__(self, compiled, replicas: int, steps: int, token_time: list, firings: list, deadlock_steps: list):
+        """
+        Aggregate statistics of many independent simulation runs.
+        :compiled: The CompiledNet simulated.
+        :replicas: Number of runs.
+        :steps: Number of steps of every run (a deadlocked run stays in its last marking).
+        :token_time: For every place the sum over runs and steps of its tokens.
+        :firings: For every transition the number of firings over all runs.
+        :deadlock_steps: Step at which each deadlocked run stopped.
+        """
+        self.compiled = compiled
+        self.replicas = replicas
+        self.steps = steps
+        self.token_time = token_time
+        self.firings = firings
+        self.deadlock_steps = deadlock_steps
+
+    def occupancy(self) -> dict:
+        """
+        Mean number of tokens of every place over the markings after every step of all runs
+        """
+        total = self.replicas * self.steps or 1
+        return dict((name, tokens / total) for name, tokens in zip(self.compiled.place_names, self.token_time))
+
+    def firing_counts(self) -> dict:
+        """
+        Number of firings of every transition over all runs
+        """
+        return dict(zip(self.compiled.transition_names, self.firings))
+
+    def throughput(self) -> dict:
+        """
+        Mean number of firings of every transition per step
+        """
+        total = self.replicas * self.steps or 1
+        return dict((name, count / total) for name, count in zip(self.compiled.transition_names, self.firings))
+
+    def deadlock_frequency(self) -> float:
+        """
+        Fraction of runs which ended in a deadlock
+        """
+        return len(self.deadlock_steps) / self.replicas if self.replicas else 0.0
+
+    def mean_deadlock_step(self):
+        """
+        Mean step at which the deadlocked runs stopped (None if no run deadlocked)
+        """
+        if not self.deadlock_steps:
+            return None
+        return sum(self.deadlock_steps) / len(self.deadlock_steps)
+
+
+def _run_replicas(compiled, first: int, last: int, steps: int, seed, rates) -> tuple:
+    """
+    Advance replicas first..last-1 in lockstep and return (token_time, firings, deadlock_steps)
+    """
+    fire = compiled.fire
+    update = compiled.update_enabled
+    arcs = [tuple(set(p for p, _ in pre + post)) for pre, post in zip(compiled.pre, compiled.post)]
+    n = last - first
+    rngs = [random.Random("{}:{}".format(seed, r)) for r in range(first, last)]
+    markings = [compiled.initial] * n                                       # replica x place
+    enabled = [set(compiled.enabled(compiled.initial)) for _ in range(n)]
+    changed = [[0] * len(compiled.place_names) for _ in range(n)]           # step of the last change of a place
+    token_time = [0] * len(compiled.place_names)
+    firings = [0] * len(compiled.transition_names)
+    deadlock_steps = []
+    alive = list(range(n))
+
+    def moves(r) -> tuple:
+        candidates = sorted(enabled[r])
+        if rates is None:
+            return candidates, None
+        weights = [rates[t] for t in candidates]
+        return (candidates, weights) if any(weights) else ([], None)
+
+    for step in range(steps):
+        still_alive = []
+        for r in alive:
+            candidates, weights = moves(r)
+            if not candidates:
+                deadlock_steps.append(step)
+                continue
+            t = rngs[r].choices(candidates, weights)[0] if weights else rngs[r].choice(candidates)
+            marking = markings[r]
+            last_change = changed[r]
+            for p in arcs[t]:
+                token_time[p] += marking[p] * (step - last_change[p])
+                last_change[p] = step
+            marking = fire(t, marking)
+            update(enabled[r], t, marking)
+            markings[r] = marking
+            firings[t] += 1
+            still_alive.append(r)
+        alive = still_alive
+
+    # runs which reached a deadlock with the last step
+    deadlock_steps.extend(steps for r in alive if not moves(r)[0])
+    for r in range(n):
+        for p, tokens in enumerate(markings[r]):
+            token_time[p] += tokens * (steps - changed[r][p])
+    return token_time, firings, deadlock_steps
+
+
+def monte_carlo(net, replicas: int, steps: int, seed=0, rates=None, workers=None) -> MonteCarloStats:
+    """
+    Stochastic token game: every run fires a random enabled transition per step.
+    Runs are seeded one by one, so the result doesn't depend on the number of workers.
+    :net: PetriNet or CompiledNet object.
+    :replicas: Number of independent runs.
+    :steps: Number of steps of every run.
+    :seed: Seed of the runs.
+    :rates: Optional {transition name: rate}, transitions are then chosen with probability proportional to their rate.
+    :workers: Number of worker processes (0 for all cores), the runs are advanced in the main process if not given.
+    """
+    compiled = as_compiled(net)
+    if rates is not None:
+        rates = [rates.get(name, 1.0) for name in compiled.transition_names]
+    if workers is None or workers == 1:
+        parts = [_run_replicas(compiled, 0, replicas, steps, seed, rates)]
+    else:
+        workers = workers or os.cpu_count()
+        bounds = [replicas * i // workers for i in range(workers + 1)]
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(_run_replicas, compiled, bounds[i], bounds[i + 1], steps, seed, rates)
+                       for i in range(workers) if bounds[i] < bounds[i + 1]]
+            parts = [future.result() for future in futures]
+
+    token_time = [sum(values) for values in zip(*[part[0] for part in parts])]
+    firings = [sum(values) for values in zip(*[part[1] for part in parts])]
+    deadlock_steps = [step for part in parts for step in part[2]]
+    return MonteCarloStats(compiled, replicas, steps, token_time, firings, deadlock_steps)
@@ -0,0 +1,167 @@
+"""
+Run instrumentation: firing and enabledness counters, phase timers, throughput and frontier samples
+"""
+import cProfile
+import pstats
+from time import perf_counter
+
+
+class _InstrumentedNet:
+    def __init__(self, compiled, stats):
+        """
+        Stand-in for a CompiledNet which counts and times its firing and enabledness calls.
+        Everything else is read from the compiled net.
+        """
+        self._compiled = compiled
+        self._stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self._compiled, name)
+
+    def fireable(self, t: int, marking: tuple) -> bool:
+        stats = self._stats
+        start = perf_counter()
+        result = self._compiled.fireable(t, marking)
+        stats.phases["enabled"] += perf_counter() - start
+        stats.checks[t] += 1
+        return result
+
+    def enabled(self, marking: tuple) -> list:
+        stats = self._stats
+        start = perf_counter()
+        result = self._compiled.enabled(marking)
+        stats.phases["enabled"] += perf_counter() - start
+        checks = stats.checks
+        for t in range(len(checks)):
+            checks[t] += 1
+        return result
+
+    def update_enabled(self, enabled: set, t: int, marking: tuple) -> set:
+        stats = self._stats
+        start = perf_counter()
+        result = self._compiled.update_enabled(enabled, t, marking)
+        stats.phases["enabled"] += perf_counter() - start
+        checks = stats.checks
+        for u in self._compiled.affected[t]:
+            checks[u] += 1
+        return result
+
+    def fire(self, t: int, marking: tuple) -> tuple:
+        stats = self._stats
+        start = perf_counter()
+        result = self._compiled.fire(t, marking)
+        stats.phases["firing"] += perf_counter() - start
+        stats.fires[t] += 1
+        return result
+
+
+class RunStats:
+    def __init__(self, sample_every=1000):
+        """
+        Counters and timers of one run (exploration or simulation).
+        Pass it as stats= to explore(), simulate() or iter_concurrent(); runs without it pay nothing.
+        :sample_every: Record the frontier size every that many expanded states.
+        """
+        self.sample_every = sample_every
+        self.transition_names = []
+        self.fires = []         # transition index -> number of firings
+        self.checks = []        # transition index -> number of enabledness tests
+        self.phases = {"enabled": 0.0, "firing": 0.0, "hashing": 0.0, "callbacks": 0.0}
+        self.states = 0         # states (markings) found
+        self.expanded = 0       # states expanded (simulation steps)
+        self.elapsed = 0.0
+        self.samples = []       # (seconds since start, frontier size, states found)
+        self._start = None
+
+    def instrument(self, compiled) -> _InstrumentedNet:
+        """
+        Start the clock and return a counting stand-in for the compiled net
+        """
+        if len(self.fires) != len(compiled.transition_names):
+            self.transition_names = list(compiled.transition_names)
+            self.fires = [0] * len(compiled.transition_names)
+            self.checks = [0] * len(compiled.transition_names)
+        self.start()
+        return _InstrumentedNet(compiled, self)
+
+    def start(self) -> None:
+        """
+        Start (or restart after stop) the clock
+        """
+        self._start = perf_counter()
+
+    def timed(self, phase: str, func):
+        """
+        func, with the time of its calls added to the phase
+        """
+        phases = self.phases
+
+        def call(*args):
+            start = perf_counter()
+            result = func(*args)
+            phases[phase] += perf_counter() - start
+            return result
+        return call
+
+    def expand(self, frontier: int, states: int) -> None:
+        """
+        Count an expanded state and sample the frontier size now and then
+        :frontier: Number of states waiting in the frontier.
+        :states: Number of states found so far.
+        """
+        self.expanded += 1
+        self.states = states
+        if self.expanded % self.sample_every == 1 or self.sample_every == 1:
+            self.samples.append((self.elapsed + perf_counter() - self._start, frontier, states))
+
+    def stop(self, states=None) -> None:
+        """
+        Stop the clock
+        :states: Final number of states found.
+        """
+        self.elapsed += perf_counter() - self._start
+        if states is not None:
+            self.states = states
+
+    def states_per_second(self) -> float:
+        return self.states / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> dict:
+        """
+        All counters as plain data (per transition counters are keyed by transition name)
+        """
+        return {
+            "elapsed": self.elapsed,
+            "states": self.states,
+            "expanded": self.expanded,
+            "states_per_second": self.states_per_second(),
+            "phases": dict(self.phases),
+            "fires": dict(zip(self.transition_names, self.fires)),
+            "checks": dict(zip(self.transition_names, self.checks)),
+            "frontier": list(self.samples),
+        }
+
+    def report(self) -> str:
+        """
+        Human readable summary
+        """
+        lines = ["{} states in {:.3f}s ({:.0f} states/s), {} expanded".format(
+            self.states, self.elapsed, self.states_per_second(), self.expanded)]
+        width = max([len(name) for name in list(self.phases) + self.transition_names]) + 2
+        lines += ["  {}{:.3f}s".format(phase.ljust(width), seconds) for phase, seconds in self.phases.items()]
+        lines += ["  {}fired {} checked {}".format(name.ljust(width), fires, checks)
+                  for name, fires, checks in zip(self.transition_names, self.fires, self.checks)]
+        return "\n".join(lines)
+
+
+def profile(func, *args, path=None, sort="cumulative", **kwargs):
+    """
+    Run func under cProfile, return (its result, pstats.Stats).
+    :path: Also write the profile there (readable by pstats, snakeviz, ...).
+    :sort: Sort key of the returned stats.
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    if path is not None:
+        profiler.dump_stats(path)
+    return result, pstats.Stats(profiler).sort_stats(sort)
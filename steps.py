@@ -0,0 +1,178 @@
+"""
+Step semantics: sets of transitions fired together as one update, maximal conflict-free steps
+"""
+import random
+
+
+class StepSemantics:
+    def __init__(self, compiled, cache_size=4096):
+        """
+        Steps of a compiled net. A step is a set of transitions which are all fireable at the marking,
+        whose inputs together don't need more tokens than the marking holds and which don't compete
+        for the room of a bounded place (conflict-free), so every interleaving of it reaches the same marking.
+        Firing a step consumes the inputs of all its transitions, then produces their outputs,
+        an output place which is full doesn't receive tokens (as CompiledNet.fire, which is the one-transition step).
+        :compiled: The CompiledNet.
+        :cache_size: Number of steps whose merged arcs are kept.
+        """
+        self.compiled = compiled
+        self.cache_size = cache_size
+        self._arcs = {}     # step -> (merged input arcs, output arcs in transition order)
+
+    def _contested(self, marking: tuple, enabled: list):
+        """
+        Split the enabled transitions into those which never conflict and the others.
+        Transitions conflict over the tokens of a place when together they need more than it holds,
+        and over the room of a bounded place which is the output of one and touched by another.
+        Returns (free, rest, tokens left of the contested places,
+        {contested bounded place: [room left, producers, consumers]}).
+        """
+        compiled = self.compiled
+        pre = compiled.pre
+        post = compiled.post
+        capacity = compiled.capacity
+        demand = {}
+        touching = {}
+        for t in enabled:
+            for p, w in pre[t]:
+                demand[p] = demand.get(p, 0) + w
+                touching.setdefault(p, set()).add(t)
+            for p, _ in post[t]:
+                touching.setdefault(p, set()).add(t)
+        left = dict((p, marking[p]) for p, d in demand.items() if d > marking[p])
+        outputs = set(p for t in enabled for p, _ in post[t] if capacity[p] != -1)
+        room = dict((p, [capacity[p] - marking[p], 0, 0]) for p in outputs if len(touching[p]) > 1)
+        free = []
+        rest = []
+        for t in enabled:
+            contested = (any(p in left for p, _ in pre[t]) or
+                         any(p in room for p, _ in pre[t] + post[t]))
+            (rest if contested else free).append(t)
+        return free, rest, left, room
+
+    def _fits(self, t: int, left: dict, room: dict) -> bool:
+        """
+        Check whether t can join the step without a conflict, so every interleaving of the step
+        gives the same marking as the step: a contested bounded place which gets tokens from the step
+        isn't consumed by another transition of it, and its producers together fit in its room
+        (a single producer keeps the capacity rule of CompiledNet.fire).
+        """
+        compiled = self.compiled
+        if not all(left.get(p, w) >= w for p, w in compiled.pre[t]):
+            return False
+        outputs = set(p for p, _ in compiled.post[t])
+        for p, _ in compiled.pre[t]:
+            if p in room and (room[p][1] or (p in outputs and room[p][2])):
+                return False
+        for p, w in compiled.post[t]:
+            if p in room:
+                space, producers, consumers = room[p]
+                if consumers or (producers and space < w):
+                    return False
+        return True
+
+    def _take(self, t: int, left: dict, room: dict, sign: int) -> None:
+        """
+        Add (sign 1) or remove (sign -1) the claims of t on the contested tokens and room
+        """
+        compiled = self.compiled
+        for p, w in compiled.pre[t]:
+            if p in left:
+                left[p] -= sign * w
+            if p in room:
+                room[p][2] += sign
+        for p, w in compiled.post[t]:
+            if p in room:
+                room[p][0] -= sign * w
+                room[p][1] += sign
+
+    def maximal_steps(self, marking: tuple, enabled=None) -> list:
+        """
+        All maximal conflict-free steps (sorted tuples of transition indices), found by backtracking
+        over the transitions which compete for tokens; the others are in every step.
+        :marking: The marking.
+        :enabled: Enabled transition indices at the marking (computed if not given).
+        """
+        enabled = sorted(self.compiled.enabled(marking) if enabled is None else enabled)
+        if not enabled:
+            return []
+        free, rest, left, room = self._contested(marking, enabled)
+        steps = []
+        chosen = []
+
+        def extend(i):
+            if i == len(rest):
+                # maximal: every transition left out no longer fits
+                if all(t in chosen or not self._fits(t, left, room) for t in rest):
+                    steps.append(tuple(sorted(free + chosen)))
+                return
+            t = rest[i]
+            if self._fits(t, left, room):
+                self._take(t, left, room, 1)
+                chosen.append(t)
+                extend(i + 1)
+                chosen.pop()
+                self._take(t, left, room, -1)
+            extend(i + 1)
+
+        extend(0)
+        return steps
+
+    def step(self, marking: tuple, enabled=None, policy="greedy", rng=None) -> tuple:
+        """
+        One maximal conflict-free step chosen by a policy, () if nothing is enabled
+        :marking: The marking.
+        :enabled: Enabled transition indices at the marking (computed if not given).
+        :policy: "greedy" (competing transitions are taken in index order), "random" (in random order),
+                 or a function (list of all maximal steps, marking) -> one of them.
+        :rng: random.Random of the random policy.
+        """
+        if callable(policy):
+            steps = self.maximal_steps(marking, enabled)
+            return policy(steps, marking) if steps else ()
+        enabled = sorted(self.compiled.enabled(marking) if enabled is None else enabled)
+        free, rest, left, room = self._contested(marking, enabled)
+        if policy == "random":
+            rest = list(rest)
+            (rng or random).shuffle(rest)
+        elif policy != "greedy":
+            raise ValueError("Unknown step policy '{}'".format(policy))
+        for t in rest:
+            if self._fits(t, left, room):
+                self._take(t, left, room, 1)
+                free.append(t)
+        return tuple(sorted(free))
+
+    def _merged(self, step: tuple):
+        arcs = self._arcs.get(step)
+        if arcs is None:
+            compiled = self.compiled
+            consumed = {}
+            for t in step:
+                for p, w in compiled.pre[t]:
+                    consumed[p] = consumed.get(p, 0) + w
+            arcs = (tuple(consumed.items()), tuple(arc for t in step for arc in compiled.post[t]))
+            if len(self._arcs) >= self.cache_size:
+                self._arcs.clear()
+            self._arcs[step] = arcs
+        return arcs
+
+    def fire(self, step: tuple, marking: tuple) -> tuple:
+        """
+        Marking reached by firing the step (it must be conflict-free) as one update
+        """
+        capacity = self.compiled.capacity
+        consumed, produced = self._merged(step)
+        m = list(marking)
+        for p, w in consumed:
+            m[p] -= w
+        for p, w in produced:
+            if capacity[p] == -1 or m[p] + 1 <= capacity[p]:
+                m[p] += w
+        return tuple(m)
+
+    def successors(self, marking: tuple, enabled=None) -> list:
+        """
+        (step, marking reached) for every maximal step at the marking
+        """
+        return [(step, self.fire(step, marking)) for step in self.maximal_steps(marking, enabled)]
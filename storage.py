@@ -0,0 +1,251 @@
+"""
+Binary files for compiled nets and reachability graphs, loaded through mmap
+"""
+import mmap
+import struct
+import zlib
+from array import array
+from engine import CompiledNet
+
+NET_MAGIC = b"PNET"
+GRAPH_MAGIC = b"PNRG"
+VERSION = 1
+_NET_HEADER = struct.Struct("<4sIQQQQ")      # magic, version, places, transitions, input arcs, output arcs
+_GRAPH_HEADER = struct.Struct("<4sIQQQQQ")   # magic, version, places, transitions, states, edges, hash table size
+
+
+def _pad(f) -> None:
+    """
+    Align the next section to 8 bytes
+    """
+    f.write(b"\0" * (-f.tell() % 8))
+
+
+def _write_names(f, names) -> None:
+    data = "\0".join(names).encode("utf-8")
+    f.write(struct.pack("<Q", len(data)))
+    f.write(data)
+    _pad(f)
+
+
+def _write_array(f, typecode: str, values) -> None:
+    array(typecode, values).tofile(f)
+    _pad(f)
+
+
+class _Reader:
+    def __init__(self, buffer):
+        """
+        Sequential reader of the sections of a mapped file
+        """
+        self.view = memoryview(buffer)
+        self.pos = 0
+
+    def header(self, layout: struct.Struct) -> tuple:
+        values = layout.unpack_from(self.view, 0)
+        self.pos = layout.size
+        self.pos += -self.pos % 8
+        return values
+
+    def names(self) -> list:
+        size = struct.unpack_from("<Q", self.view, self.pos)[0]
+        data = bytes(self.view[self.pos + 8:self.pos + 8 + size]).decode("utf-8")
+        self.pos += 8 + size
+        self.pos += -self.pos % 8
+        return data.split("\0") if size else []
+
+    def array(self, typecode: str, count: int) -> memoryview:
+        """
+        Zero copy view of the next array section
+        """
+        size = array(typecode).itemsize * count
+        view = self.view[self.pos:self.pos + size].cast(typecode)
+        self.pos += size
+        self.pos += -self.pos % 8
+        return view
+
+
+def _check_header(magic, version, expected: bytes, path: str) -> None:
+    if magic != expected or version != VERSION:
+        raise ValueError("'{}' isn't a version {} {} file".format(path, VERSION, expected.decode()))
+
+
+def save_net(net, path: str) -> None:
+    """
+    Write a net (PetriNet or CompiledNet) with its initial marking to a binary file
+    :net: The petri net.
+    :path: File path.
+    """
+    compiled = net if isinstance(net, CompiledNet) else net.compile()
+    with open(path, "wb") as f:
+        f.write(_NET_HEADER.pack(NET_MAGIC, VERSION, len(compiled.place_names), len(compiled.transition_names),
+                                 sum(map(len, compiled.pre)), sum(map(len, compiled.post))))
+        _pad(f)
+        _write_names(f, compiled.place_names)
+        _write_names(f, compiled.transition_names)
+        _write_array(f, "q", compiled.capacity)
+        _write_array(f, "q", compiled.initial)
+        for arcs in (compiled.pre, compiled.post):
+            offsets = [0]
+            for arc in arcs:
+                offsets.append(offsets[-1] + len(arc))
+            _write_array(f, "q", offsets)
+            _write_array(f, "q", [p for arc in arcs for p, _ in arc])
+            _write_array(f, "q", [w for arc in arcs for _, w in arc])
+
+
+def load_net(path: str) -> CompiledNet:
+    """
+    Read a net written by save_net
+    :path: File path.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        reader = _Reader(mm)
+        magic, version, n_places, n_transitions, n_pre, n_post = reader.header(_NET_HEADER)
+        _check_header(magic, version, NET_MAGIC, path)
+        place_names = reader.names()
+        transition_names = reader.names()
+        capacity = reader.array("q", n_places).tolist()
+        initial = reader.array("q", n_places).tolist()
+        arcs = []
+        for count in (n_pre, n_post):
+            offsets = reader.array("q", n_transitions + 1).tolist()
+            places = reader.array("q", count).tolist()
+            weights = reader.array("q", count).tolist()
+            arcs.append([list(zip(places[offsets[t]:offsets[t + 1]], weights[offsets[t]:offsets[t + 1]]))
+                         for t in range(n_transitions)])
+        del reader
+    return CompiledNet(place_names, capacity, transition_names, arcs[0], arcs[1], initial)
+
+
+def _row_hash(row: bytes) -> int:
+    return zlib.crc32(row)
+
+
+def save_graph(graph, path: str) -> None:
+    """
+    Write a reachability graph to a binary file: the markings (int32, one row per state),
+    the edges in CSR form (offsets, targets, transition labels) and a hash table from markings to state ids.
+    :graph: ReachabilityGraph object.
+    :path: File path.
+    """
+    compiled = graph.compiled
+    n_states = len(graph.markings)
+    n_edges = len(graph.edges)
+    table_size = 1
+    while table_size < 2 * n_states:
+        table_size *= 2
+
+    rows = array("i")
+    for marking in graph.markings:
+        rows.extend(marking)
+    row_size = rows.itemsize * len(compiled.place_names)
+    data = rows.tobytes()
+    table = array("i", [-1]) * table_size
+    for state in range(n_states):
+        slot = _row_hash(data[state * row_size:(state + 1) * row_size]) % table_size
+        while table[slot] != -1:
+            slot = (slot + 1) % table_size
+        table[slot] = state
+
+    offsets = array("q", [0])
+    targets = array("i")
+    labels = array("i")
+    for state in range(n_states):
+        for t, target in graph.successors(state):
+            targets.append(target)
+            labels.append(t)
+        offsets.append(len(targets))
+
+    with open(path, "wb") as f:
+        f.write(_GRAPH_HEADER.pack(GRAPH_MAGIC, VERSION, len(compiled.place_names), len(compiled.transition_names),
+                                   n_states, n_edges, table_size))
+        _pad(f)
+        _write_names(f, compiled.place_names)
+        _write_names(f, compiled.transition_names)
+        f.write(data)
+        _pad(f)
+        for section in (offsets, targets, labels, table):
+            section.tofile(f)
+            _pad(f)
+
+
+class MappedGraph:
+    def __init__(self, path: str):
+        """
+        Reachability graph read by mmap from a file written by save_graph,
+        nothing but the names is copied into memory.
+        :path: File path.
+        """
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        reader = _Reader(self._mm)
+        magic, version, n_places, n_transitions, n_states, n_edges, table_size = reader.header(_GRAPH_HEADER)
+        _check_header(magic, version, GRAPH_MAGIC, path)
+        self.place_names = reader.names()
+        self.transition_names = reader.names()
+        self.n_edges = n_edges
+        self._n_states = n_states
+        self._n_places = n_places
+        self._row_start = reader.pos
+        self._markings = reader.array("i", n_states * n_places)
+        self._row_size = self._markings.itemsize * n_places
+        self._offsets = reader.array("q", n_states + 1)
+        self._targets = reader.array("i", n_edges)
+        self._labels = reader.array("i", n_edges)
+        self._table = reader.array("i", table_size)
+
+    def close(self) -> None:
+        for view in (self._markings, self._offsets, self._targets, self._labels, self._table):
+            view.release()
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._n_states
+
+    def marking(self, state: int) -> tuple:
+        start = state * self._n_places
+        return tuple(self._markings[start:start + self._n_places])
+
+    def successors(self, state: int) -> list:
+        """
+        The (transition index, target id) pairs leaving the state
+        """
+        start, stop = self._offsets[state], self._offsets[state + 1]
+        return list(zip(self._labels[start:stop], self._targets[start:stop]))
+
+    def find(self, marking) -> int:
+        """
+        State id of the marking (None if it isn't in the graph)
+        """
+        row = array("i", marking).tobytes()
+        table = self._table
+        slot = _row_hash(row) % len(table)
+        while table[slot] != -1:
+            state = table[slot]
+            start = self._row_start + state * self._row_size
+            if self._mm[start:start + self._row_size] == row:
+                return state
+            slot = (slot + 1) % len(table)
+        return None
+
+    def deadlocks(self) -> list:
+        offsets = self._offsets
+        return [s for s in range(self._n_states) if offsets[s] == offsets[s + 1]]
+
+    def label(self, state: int) -> str:
+        """
+        State label in the form "[1.free, 1.busy]"
+        """
+        return "[" + ", ".join("{0}.{1}".format(h, name) for h, name in zip(self.marking(state), self.place_names)
+                               if h != 0) + "]"
+
+    def transition_name(self, t: int) -> str:
+        return self.transition_names[t]
@@ -0,0 +1,147 @@
+"""
+Visited-state stores for markings packed into fixed-width bytes
+"""
+import hashlib
+from structural import place_bounds
+
+
+_BOUNDS_MAX_ROWS = 1000     # Farkas table limit when deriving bounds for a store
+
+
+class MarkingPacker:
+    def __init__(self, capacity, default_bits=32):
+        """
+        Pack markings into fixed-width bytes.
+        A bounded place gets just enough bits for its bound,
+        an unbounded place (bound -1) gets default_bits.
+        :capacity: Most tokens every place can hold (-1 for unbounded place), see CompiledNet.token_bounds.
+        :default_bits: Number of bits for an unbounded place.
+        """
+        self.bits = [(c.bit_length() or 1) if c != -1 else default_bits for c in capacity]
+        self.shifts = []
+        shift = 0
+        for b in self.bits:
+            self.shifts.append(shift)
+            shift += b
+        self.limits = [(1 << b) - 1 for b in self.bits]
+        self.size = (shift + 7) // 8 or 1    # bytes per marking
+
+    def pack(self, marking: tuple) -> bytes:
+        """
+        Packed form of the marking
+        """
+        value = 0
+        for h, shift, limit in zip(marking, self.shifts, self.limits):
+            if h > limit:
+                raise OverflowError("Marking {} doesn't fit in the packed width".format(marking))
+            value |= h << shift
+        return value.to_bytes(self.size, "little")
+
+    def unpack(self, data: bytes) -> tuple:
+        """
+        Marking of the packed form
+        """
+        value = int.from_bytes(data, "little")
+        return tuple((value >> shift) & limit for shift, limit in zip(self.shifts, self.limits))
+
+
+class ExactStore:
+    def __init__(self, packer: MarkingPacker):
+        """
+        Exact visited-state store (hash set of packed markings).
+        :packer: The MarkingPacker of the net.
+        """
+        self.packer = packer
+        self._seen = set()
+
+    def add(self, marking: tuple) -> bool:
+        """
+        Add a marking, return True if it wasn't in the store yet
+        """
+        data = self.packer.pack(marking)
+        if data in self._seen:
+            return False
+        self._seen.add(data)
+        return True
+
+    def __contains__(self, marking) -> bool:
+        return self.packer.pack(marking) in self._seen
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+
+class BitstateStore:
+    def __init__(self, packer: MarkingPacker, memory=1 << 24, hashes=3):
+        """
+        Probabilistic visited-state store (bitstate hashing) in a fixed bit array.
+        A new marking may be taken as already visited when all its bits are set
+        by other markings, so an exploration may miss states but never runs out of memory.
+        :packer: The MarkingPacker of the net.
+        :memory: Size of the bit array in bytes.
+        :hashes: Number of bits set per marking.
+        """
+        self.packer = packer
+        self.hashes = hashes
+        self._bits = bytearray(memory)
+        self._nbits = memory * 8
+        self._count = 0
+
+    def _positions(self, marking) -> list:
+        digest = hashlib.blake2b(self.packer.pack(marking), digest_size=8 * self.hashes).digest()
+        return [int.from_bytes(digest[8 * i:8 * i + 8], "little") % self._nbits for i in range(self.hashes)]
+
+    def add(self, marking: tuple) -> bool:
+        """
+        Add a marking, return True if it wasn't in the store yet (may wrongly return False)
+        """
+        bits = self._bits
+        new = False
+        for pos in self._positions(marking):
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                new = True
+        if new:
+            self._count += 1
+        return new
+
+    def __contains__(self, marking) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(marking))
+
+    def __len__(self) -> int:
+        """
+        Number of markings taken as new
+        """
+        return self._count
+
+    def fill_ratio(self) -> float:
+        """
+        Fraction of set bits, the chance of a false hit grows with it
+        """
+        return sum(bin(b).count("1") for b in self._bits) / self._nbits
+
+
+def make_store(compiled, backend="exact", memory=1 << 24, default_bits=32, marking=None, invariants=False):
+    """
+    Visited-state store for the markings of a compiled net.
+    :compiled: The CompiledNet.
+    :backend: "exact" or "bitstate".
+    :memory: Bit array size in bytes for the bitstate backend.
+    :default_bits: Number of bits for a place no bound is known for.
+    :marking: Marking the exploration starts from (the initial marking if not given).
+    :invariants: Also bound places without max_token by the place invariants (structural.place_bounds),
+                 fewer bits per marking but a Farkas computation over the dense incidence matrix first,
+                 only worth it for small nets.
+    """
+    if invariants:
+        bounds = place_bounds(compiled, marking, _BOUNDS_MAX_ROWS)
+    else:
+        bounds = compiled.token_bounds(marking)
+    packer = MarkingPacker(bounds, default_bits)
+    if backend == "exact":
+        return ExactStore(packer)
+    if backend == "bitstate":
+        return BitstateStore(packer, memory)
+    raise ValueError("Unknown store backend '{}'".format(backend))
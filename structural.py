@@ -0,0 +1,177 @@
+"""
+Structural analysis on the incidence matrix: invariants, siphons, traps and token bounds
+"""
+from math import gcd
+from engine import as_compiled
+
+
+def incidence(net) -> list:
+    """
+    Incidence matrix C with one row per place and one column per transition
+    :net: PetriNet or CompiledNet object.
+    """
+    compiled = as_compiled(net)
+    return [list(column) for column in zip(*compiled.incidence_matrix())] or \
+        [[] for _ in compiled.place_names]
+
+
+def _farkas(matrix: list, max_rows=None):
+    """
+    Minimal-support semi-positive solutions y of y.A = 0 (Farkas algorithm).
+    :matrix: A, one row per variable.
+    :max_rows: Give up (return None) when the working table grows past that many rows.
+    """
+    n = len(matrix)
+    rows = [(list(row), [1 if i == j else 0 for j in range(n)]) for i, row in enumerate(matrix)]
+    columns = len(matrix[0]) if matrix else 0
+    for c in range(columns):
+        kept = [row for row in rows if row[0][c] == 0]
+        positive = [row for row in rows if row[0][c] > 0]
+        negative = [row for row in rows if row[0][c] < 0]
+        for a, y_a in positive:
+            for b, y_b in negative:
+                # combine so that column c cancels
+                f_a, f_b = -b[c], a[c]
+                a_new = [f_a * x + f_b * z for x, z in zip(a, b)]
+                y_new = [f_a * x + f_b * z for x, z in zip(y_a, y_b)]
+                divisor = 0
+                for value in a_new + y_new:
+                    divisor = gcd(divisor, value)
+                kept.append(([x // divisor for x in a_new], [x // divisor for x in y_new]))
+        # keep one row per support, and only the rows whose support is minimal
+        by_support = {}
+        for row in kept:
+            by_support.setdefault(frozenset(i for i, x in enumerate(row[1]) if x), row)
+        rows = [row for support, row in by_support.items()
+                if not any(other < support for other in by_support)]
+        if max_rows is not None and len(rows) > max_rows:
+            return None
+    return [y for _, y in rows]
+
+
+def p_invariants(net) -> list:
+    """
+    Minimal semi-positive place invariants {place name: weight}:
+    the weighted token sum of their places never changes by firing
+    (it can only drop when a full output place doesn't receive its tokens).
+    :net: PetriNet or CompiledNet object.
+    """
+    compiled = as_compiled(net)
+    return [dict((name, w) for name, w in zip(compiled.place_names, y) if w)
+            for y in _farkas(incidence(compiled))]
+
+
+def t_invariants(net) -> list:
+    """
+    Minimal semi-positive transition invariants {transition name: count}:
+    firing the transitions that many times leads back to the same marking.
+    :net: PetriNet or CompiledNet object.
+    """
+    compiled = as_compiled(net)
+    return [dict((name, w) for name, w in zip(compiled.transition_names, x) if w)
+            for x in _farkas(compiled.incidence_matrix())]
+
+
+def place_bounds(net, marking=None, max_rows=None) -> list:
+    """
+    Upper bound of the tokens of every place: what its max_token allows (CompiledNet.token_bounds),
+    or what the place invariants allow from the marking, -1 if neither bounds it.
+    An invariant y gives h[p] <= y.M0 / y[p]; the bound holds even when a full output place
+    drops its tokens, since that only lowers y.M.
+    :net: PetriNet or CompiledNet object.
+    :marking: Marking the bounds hold from (the initial marking if not given).
+    :max_rows: Limit of the Farkas table, beyond it only the max_tokens are used.
+    """
+    compiled = as_compiled(net)
+    marking = compiled.initial if marking is None else marking
+    bounds = compiled.token_bounds(marking)
+    for y in _farkas(incidence(compiled), max_rows) or ():
+        total = sum(w * h for w, h in zip(y, marking))
+        for p, w in enumerate(y):
+            if w:
+                bound = total // w
+                if bounds[p] == -1 or bound < bounds[p]:
+                    bounds[p] = bound
+    return bounds
+
+
+def _arcs(compiled):
+    """
+    For every place its producers and consumers, for every transition its input and output places
+    """
+    producers = [set() for _ in compiled.place_names]
+    consumers = [set() for _ in compiled.place_names]
+    inputs = [set(p for p, _ in pre) for pre in compiled.pre]
+    outputs = [set(p for p, _ in post) for post in compiled.post]
+    for t in range(len(compiled.transition_names)):
+        for p in inputs[t]:
+            consumers[p].add(t)
+        for p in outputs[t]:
+            producers[p].add(t)
+    return producers, consumers, inputs, outputs
+
+
+def is_siphon(net, places) -> bool:
+    """
+    Check whether every transition putting tokens into the places also takes tokens from them
+    (an empty siphon stays empty)
+    """
+    compiled = as_compiled(net)
+    producers, _, inputs, _ = _arcs(compiled)
+    chosen = set(compiled.place_index[name] for name in places)
+    return all(inputs[t] & chosen for p in chosen for t in producers[p])
+
+
+def is_trap(net, places) -> bool:
+    """
+    Check whether every transition taking tokens from the places also puts tokens into them
+    (a marked trap stays marked)
+    """
+    compiled = as_compiled(net)
+    _, consumers, _, outputs = _arcs(compiled)
+    chosen = set(compiled.place_index[name] for name in places)
+    return all(outputs[t] & chosen for p in chosen for t in consumers[p])
+
+
+def _minimal_sets(compiled, needing, candidates) -> list:
+    """
+    Minimal non-empty place sets S where every transition of needing[p] (p in S)
+    has one of candidates[t] in S
+    """
+    found = set()
+    for start in range(len(compiled.place_names)):
+        stack = [frozenset([start])]
+        seen = set()
+        while stack:
+            chosen = stack.pop()
+            if chosen in seen or any(f <= chosen for f in found):
+                continue
+            seen.add(chosen)
+            missing = next((t for p in chosen for t in needing[p] if not candidates[t] & chosen), None)
+            if missing is None:
+                found = set(f for f in found if not chosen < f)
+                found.add(chosen)
+                continue
+            for p in candidates[missing]:
+                stack.append(chosen | {p})
+    return [sorted(compiled.place_names[p] for p in f) for f in found]
+
+
+def siphons(net) -> list:
+    """
+    Minimal siphons as lists of place names
+    :net: PetriNet or CompiledNet object.
+    """
+    compiled = as_compiled(net)
+    producers, _, inputs, _ = _arcs(compiled)
+    return _minimal_sets(compiled, producers, inputs)
+
+
+def traps(net) -> list:
+    """
+    Minimal traps as lists of place names
+    :net: PetriNet or CompiledNet object.
+    """
+    compiled = as_compiled(net)
+    _, consumers, _, outputs = _arcs(compiled)
+    return _minimal_sets(compiled, consumers, outputs)
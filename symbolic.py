@@ -0,0 +1,238 @@
+"""
+Symbolic reachability: sets of markings as multi-valued decision diagrams (MDD)
+"""
+from engine import as_compiled
+from structural import place_bounds
+
+FALSE = 0
+TRUE = 1
+
+
+class MDD:
+    def __init__(self, domains: list):
+        """
+        Quasi-reduced MDD forest, one level per place (level i holds 0..domains[i]-1 tokens).
+        Every path from a root visits all levels, only FALSE may be reached early.
+        Nodes are hash-consed, so two equal sets always have the same node id.
+        :domains: Number of values of every level.
+        """
+        self.domains = list(domains)
+        self.nodes = [None, None]       # node id -> (level, children), ids 0 and 1 are FALSE and TRUE
+        self._unique = {}
+        self._union = {}
+        self._count = {}
+
+    def make(self, level: int, children) -> int:
+        """
+        Node id of the level node with the given children
+        """
+        children = tuple(children)
+        if all(c == FALSE for c in children):
+            return FALSE
+        key = (level, children)
+        node = self._unique.get(key)
+        if node is None:
+            node = len(self.nodes)
+            self.nodes.append(key)
+            self._unique[key] = node
+        return node
+
+    def marking(self, marking) -> int:
+        """
+        Node of the set holding only the marking
+        """
+        node = TRUE
+        for level in range(len(self.domains) - 1, -1, -1):
+            if marking[level] >= self.domains[level]:
+                raise ValueError("Marking {} is out of the domain of level {}".format(marking, level))
+            children = [FALSE] * self.domains[level]
+            children[marking[level]] = node
+            node = self.make(level, children)
+        return node
+
+    def union(self, a: int, b: int) -> int:
+        if a == FALSE or a == b:
+            return b
+        if b == FALSE:
+            return a
+        if a > b:
+            a, b = b, a
+        result = self._union.get((a, b))
+        if result is None:
+            level, children_a = self.nodes[a]
+            children_b = self.nodes[b][1]
+            result = self.make(level, [self.union(x, y) for x, y in zip(children_a, children_b)])
+            self._union[(a, b)] = result
+        return result
+
+    def count(self, node: int) -> int:
+        """
+        Number of markings in the set
+        """
+        if node <= TRUE:
+            return node
+        result = self._count.get(node)
+        if result is None:
+            result = sum(self.count(c) for c in self.nodes[node][1])
+            self._count[node] = result
+        return result
+
+    def contains(self, node: int, marking) -> bool:
+        for h in marking:
+            if node <= TRUE:
+                break
+            children = self.nodes[node][1]
+            if h >= len(children):
+                return False
+            node = children[h]
+        return node == TRUE
+
+    def markings(self, node: int, prefix=()):
+        """
+        Generate all markings of the set (only sensible for small sets)
+        """
+        if node == TRUE:
+            yield prefix
+        elif node != FALSE:
+            for h, child in enumerate(self.nodes[node][1]):
+                yield from self.markings(child, prefix + (h,))
+
+
+class _Image:
+    def __init__(self, mdd: MDD, compiled, t: int):
+        """
+        Successor set computation for one transition.
+        Only the places on the arcs of t (its support) are read and rewritten,
+        the local successor of a support assignment is computed once with the compiled net.
+        """
+        self.mdd = mdd
+        self.compiled = compiled
+        self.t = t
+        self.support = sorted(set(p for p, _ in compiled.pre[t] + compiled.post[t]))
+        self.position = dict((p, j) for j, p in enumerate(self.support))
+        self.local = {}     # support values before -> support values after (None if not fireable)
+        self.memo = {}
+
+    def _fire(self, values: tuple):
+        result = self.local.get(values, False)
+        if result is False:
+            marking = [0] * len(self.mdd.domains)
+            for p, h in zip(self.support, values):
+                marking[p] = h
+            result = None
+            if self.compiled.fireable(self.t, marking):
+                successor = self.compiled.fire(self.t, marking)
+                result = tuple(successor[p] for p in self.support)
+                for p, h in zip(self.support, result):
+                    if h >= self.mdd.domains[p]:
+                        raise ValueError("Place '{}' exceeds its bound {}".format(
+                            self.compiled.place_names[p], self.mdd.domains[p] - 1))
+            self.local[values] = result
+        return result
+
+    def _rec(self, node: int, level: int, prefix: tuple) -> dict:
+        """
+        Successors below level given the support values above it (prefix):
+        {new support values above level: node}
+        """
+        if node == FALSE:
+            return {}
+        if not self.support or level > self.support[-1]:
+            new = self._fire(prefix)
+            return {} if new is None else {new: node}
+        key = (node, level, prefix)
+        result = self.memo.get(key)
+        if result is not None:
+            return result
+
+        mdd = self.mdd
+        children = mdd.nodes[node][1]
+        rows = {}
+        j = self.position.get(level)
+        for h, child in enumerate(children):
+            if child == FALSE:
+                continue
+            if j is None:
+                for upper, sub in self._rec(child, level + 1, prefix).items():
+                    rows.setdefault(upper, [FALSE] * len(children))[h] = sub
+            else:
+                for new, sub in self._rec(child, level + 1, prefix + (h,)).items():
+                    row = rows.setdefault(new[:j], [FALSE] * len(children))
+                    row[new[j]] = mdd.union(row[new[j]], sub)
+        result = dict((upper, mdd.make(level, row)) for upper, row in rows.items())
+        self.memo[key] = result
+        return result
+
+    def __call__(self, node: int) -> int:
+        self.memo = {}
+        return self._rec(node, 0, ()).get((), FALSE)
+
+
+class StateSet:
+    def __init__(self, mdd: MDD, root: int, place_names: list):
+        """
+        Set of markings stored in an MDD.
+        :mdd: The MDD forest.
+        :root: Root node of the set.
+        :place_names: Names of the places (the levels).
+        """
+        self.mdd = mdd
+        self.root = root
+        self.place_names = place_names
+
+    def count(self) -> int:
+        """
+        Number of markings in the set (may be larger than len() can return)
+        """
+        return self.mdd.count(self.root)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __contains__(self, marking) -> bool:
+        return self.mdd.contains(self.root, marking)
+
+    def __iter__(self):
+        return self.mdd.markings(self.root)
+
+    def nodes(self) -> int:
+        """
+        Number of MDD nodes of the set
+        """
+        seen = set()
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node > TRUE and node not in seen:
+                seen.add(node)
+                stack.extend(self.mdd.nodes[node][1])
+        return len(seen)
+
+
+def reachable_set(net, bounds=None) -> StateSet:
+    """
+    All reachable markings as an MDD, computed by chained image iteration:
+    every round applies each transition to the current set until nothing new appears.
+    Every place needs a bound: an entry of bounds, its max_token or one derived from the place invariants.
+    :net: PetriNet or CompiledNet object.
+    :bounds: Optional {place name: maximum tokens}.
+    """
+    compiled = as_compiled(net)
+    bounds = bounds or {}
+    domains = []
+    for name, capacity, initial in zip(compiled.place_names, place_bounds(compiled), compiled.initial):
+        bound = bounds.get(name, capacity)
+        if bound == -1:
+            raise ValueError("Place '{}' is unbounded, give a bound for it".format(name))
+        domains.append(max(bound, initial) + 1)
+
+    mdd = MDD(domains)
+    images = [_Image(mdd, compiled, t) for t in range(len(compiled.transition_names))]
+    reached = mdd.marking(compiled.initial)
+    while True:
+        old = reached
+        for image in images:
+            reached = mdd.union(reached, image(reached))
+        if reached == old:
+            break
+    return StateSet(mdd, reached, compiled.place_names)
@@ -0,0 +1,12 @@
+import os
+from engine import CompiledNet
+from pnml import load_pnml, save_pnml
+
+
+def test_place_and_transition_may_share_a_name(tmp_path):
+    net = CompiledNet(["start", "end"], [-1, -1], ["start"], [[(0, 1)]], [[(1, 1)]], [1, 0])
+    path = os.path.join(str(tmp_path), "net.pnml")
+    save_pnml(net, path)
+    loaded = load_pnml(path)
+    assert loaded.place_names == ["start", "end"]
+    assert loaded.transition_names == ["start"]
@@ -0,0 +1,36 @@
+import random
+from engine import CompiledNet
+from reachability import reduction_report
+
+
+def full_outputs_net() -> CompiledNet:
+    """
+    t is disabled with both (capacity 1) outputs full, emptying o2 (by u) enables it
+    """
+    return CompiledNet(["s", "o1", "o2", "x", "y"], [-1, 1, 1, -1, -1], ["t", "a", "u"],
+                       [[(0, 1)], [(0, 1)], [(2, 1)]],
+                       [[(1, 1), (2, 1)], [(4, 1)], [(3, 1)]],
+                       [1, 1, 1, 0, 0])
+
+
+def test_deadlocks_kept_when_any_full_output_may_empty():
+    report = reduction_report(full_outputs_net())
+    assert report["deadlocks"] == 2
+    assert report["deadlocks_kept"]
+
+
+def test_deadlocks_kept_on_random_nets_with_capacities():
+    # every place bounded, so the full graph is finite
+    rng = random.Random(7)
+    for _ in range(300):
+        n_places, n_transitions = rng.randint(2, 5), rng.randint(2, 5)
+        capacity = [rng.choice([1, 2, 3]) for _ in range(n_places)]
+        pre = [[(p, rng.choice([1, 1, 2])) for p in rng.sample(range(n_places), rng.randint(1, 2))]
+               for _ in range(n_transitions)]
+        post = [[(p, 1) for p in rng.sample(range(n_places), rng.randint(1, 2))]
+                for _ in range(n_transitions)]
+        initial = [rng.randint(0, c) for c in capacity]
+        net = CompiledNet(["p{}".format(i) for i in range(n_places)], capacity,
+                          ["t{}".format(i) for i in range(n_transitions)], pre, post, initial)
+        report = reduction_report(net)
+        assert report["deadlocks_kept"], (capacity, pre, post, initial)
@@ -0,0 +1,41 @@
+import random
+from engine import CompiledNet
+from simulate import iter_concurrent
+from steps import StepSemantics
+
+
+def random_net(rng) -> CompiledNet:
+    n_places, n_transitions = rng.randint(2, 5), rng.randint(2, 6)
+    capacity = [rng.choice([-1, 1, 2, 3]) for _ in range(n_places)]
+    pre = [[(p, rng.choice([1, 1, 2])) for p in rng.sample(range(n_places), rng.randint(0, 2))]
+           for _ in range(n_transitions)]
+    post = [[(p, rng.choice([1, 1, 2])) for p in rng.sample(range(n_places), rng.randint(1, 2))]
+            for _ in range(n_transitions)]
+    initial = [rng.randint(0, c if c != -1 else 3) for c in capacity]
+    return CompiledNet(["p{}".format(i) for i in range(n_places)], capacity,
+                       ["t{}".format(i) for i in range(n_transitions)], pre, post, initial)
+
+
+def test_shared_bounded_output_is_a_conflict():
+    net = CompiledNet(["a", "b", "o"], [-1, -1, 1], ["t1", "t2"],
+                      [[(0, 1)], [(1, 1)]], [[(2, 1)], [(2, 1)]], [1, 1, 0])
+    assert StepSemantics(net).maximal_steps(net.initial) == [(0,), (1,)]
+    steps = list(iter_concurrent(net))
+    assert steps[0][1] == ("t1",)
+    assert steps[-1][2] == (0, 1, 1)
+
+
+def test_every_step_is_an_interleaving():
+    rng = random.Random(3)
+    for _ in range(3000):
+        net = random_net(rng)
+        semantics = StepSemantics(net)
+        marking = net.initial
+        for step in semantics.maximal_steps(marking):
+            reached = semantics.fire(step, marking)
+            for order in (list(step), list(reversed(step))):
+                m = marking
+                for t in order:
+                    assert net.fireable(t, m), (step, marking)
+                    m = net.fire(t, m)
+                assert m == reached, (step, marking)
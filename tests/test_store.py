@@ -0,0 +1,26 @@
+from engine import CompiledNet
+from reachability import count_states, explore, iter_firings
+from simulate import iter_concurrent
+from store import make_store
+
+
+def heavy_arc_net() -> CompiledNet:
+    """
+    The weight 2 arc fills b (max_token 1) with two tokens, the room check is for one token
+    """
+    return CompiledNet(["a", "b"], [-1, 1], ["t"], [[(0, 1)]], [[(1, 2)]], [1, 0])
+
+
+def test_bounds_cover_heavy_arcs():
+    assert heavy_arc_net().token_bounds() == [-1, 2]
+
+
+def test_heavy_arc_markings_fit_in_the_store():
+    net = heavy_arc_net()
+    assert len(explore(net)) == 2
+    assert count_states(net) == 2
+    assert count_states(net, backend="bitstate") == 2
+    assert list(iter_firings(net)) == [((1, 0), "t", (0, 2))]
+    assert [after for _, _, after in iter_concurrent(net)] == [(0, 2)]
+    store = make_store(net)
+    assert store.add((0, 2)) and (0, 2) in store
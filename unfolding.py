@@ -0,0 +1,362 @@
+"""
+Net unfolding: a complete finite prefix (McMillan, with the adequate order of Esparza, Roemer and Vogler)
+and deadlock and reachability checks on it
+"""
+import heapq
+from itertools import combinations
+from engine import as_compiled
+
+
+def _bits(mask: int):
+    """
+    Positions of the set bits of the mask, lowest first
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _variants(compiled):
+    """
+    Transitions of the net as a plain P/T net without capacities, every place with a capacity
+    gets a complement place (index: number of places + its position among the bounded places).
+    A transition is fireable if an output place has room before consuming, and a full output place
+    doesn't receive tokens; both depend on the marking, so the transition is split into variants
+    with the room of its bounded output places tested: room as a complement token, full as
+    capacity tokens in the place (taken and put back).
+    Returns ([(transition index, input arcs, output arcs)] with arcs as {place: weight},
+    {bounded place: complement place}).
+    """
+    capacity = compiled.capacity
+    places = len(compiled.place_names)
+    complement = {}
+    for p, cap in enumerate(capacity):
+        if cap != -1:
+            complement[p] = places + len(complement)
+    variants = []
+    for t in range(len(compiled.transition_names)):
+        pre = {}
+        post = {}
+        for p, w in compiled.pre[t]:
+            pre[p] = pre.get(p, 0) + w
+        for p, w in compiled.post[t]:
+            post[p] = post.get(p, 0) + w
+        bounded = sorted(p for p in post if p in complement)
+        if any(post[p] != 1 for p in bounded):
+            raise ValueError("Unfolding needs weight 1 arcs into places with a capacity ('{}')"
+                             .format(compiled.transition_names[t]))
+        # with an unbounded output the transition is fireable anyway, only the production into places
+        # which aren't inputs depends on the room
+        open_output = len(bounded) < len(post)
+        split = [p for p in bounded if not open_output or p not in pre]
+        for room in range(1 << len(split)):
+            has_room = set(p for i, p in enumerate(split) if room >> i & 1)
+            if not post or (not open_output and not has_room):
+                continue
+            v_pre = dict(pre)
+            v_post = dict((p, w) for p, w in post.items() if p not in complement)
+            for p, a in pre.items():
+                if p in complement and p not in post:
+                    v_post[complement[p]] = a
+            for p in bounded:
+                a = pre.get(p, 0)
+                c = complement[p]
+                if p not in split:
+                    v_post[p] = 1
+                    if a > 1:
+                        v_post[c] = a - 1
+                elif p in has_room:
+                    # one free slot before consuming
+                    v_pre[c] = 1
+                    v_post[p] = 1
+                    if a:
+                        v_post[c] = a
+                else:
+                    # full before consuming: capacity tokens, after consuming a receives only if a > 0
+                    v_pre[p] = max(a, capacity[p])
+                    v_post[p] = v_pre[p] - a + (1 if a else 0)
+                    if a > 1:
+                        v_post[c] = a - 1
+            v_pre = dict((p, w) for p, w in v_pre.items() if w)
+            v_post = dict((p, w) for p, w in v_post.items() if w)
+            # a variant taking nothing can't change the marking, it is left out
+            if v_pre:
+                variants.append((t, v_pre, v_post))
+    return variants, complement
+
+
+class Prefix:
+    def __init__(self, compiled):
+        """
+        Finite prefix of the unfolding of a net (an acyclic occurrence net).
+        Conditions are tokens on a place, events are occurrences of a transition taking
+        the conditions of their preset and producing those of their postset.
+        Every reachable marking is the marking of a configuration (causally closed,
+        conflict-free set of events) of the prefix without cut-off events.
+        :compiled: The CompiledNet which is unfolded.
+        """
+        self.compiled = compiled
+        self.variants, self.complement = _variants(compiled)
+        self.condition_place = []   # condition -> place (complement places after the places)
+        self.condition_event = []   # condition -> event producing it, -1 for the initial marking
+        self.event_variant = []     # event -> variant index
+        self.event_preset = []      # event -> conditions taken
+        self.event_postset = []     # event -> conditions produced
+        self.cutoffs = set()
+        self.truncated = False      # True if max_events stopped the construction
+        self._co = []               # condition -> bit mask of the concurrent conditions
+        self._local = []            # event -> bit mask of its local configuration
+        self._depth = []            # event -> longest causal chain up to it
+
+    def __len__(self) -> int:
+        return len(self.event_variant)
+
+    def transition(self, event: int) -> int:
+        """
+        Index of the net transition the event is an occurrence of
+        """
+        return self.variants[self.event_variant[event]][0]
+
+    def marking(self, events) -> tuple:
+        """
+        Marking of the net reached by a configuration
+        :events: The events of the configuration.
+        """
+        m = list(self.compiled.initial)
+        places = len(m)
+        for e in events:
+            _, pre, post = self.variants[self.event_variant[e]]
+            for p, w in pre.items():
+                if p < places:
+                    m[p] -= w
+            for p, w in post.items():
+                if p < places:
+                    m[p] += w
+        return tuple(m)
+
+    def configurations(self, max_states=None):
+        """
+        Yield (cut, events in firing order, marking) for every configuration without cut-off events,
+        every cut once. Their number grows with the interleavings, use deadlock() and reachable() to stop early.
+        :max_states: Give up (RuntimeError) after that many cuts.
+        """
+        return self._search(lambda m, cut: False, False, max_states, True)
+
+    def deadlock(self, max_states=None):
+        """
+        Firing sequence (transition names) to a marking which enables no transition, None if there is none.
+        Events whose preset no other event takes are taken without branching: a configuration which leaves
+        one of them out still enables it, so it isn't a deadlock.
+        :max_states: Give up (RuntimeError) after visiting that many cuts.
+        """
+        enabled = self.compiled.enabled
+        for found in self._search(lambda m, cut: not enabled(m), True, max_states):
+            return found
+        return None
+
+    def reachable(self, target: dict, max_states=None):
+        """
+        Firing sequence (transition names) to a marking with the tokens of target, None if there is none.
+        :target: {place name: tokens}, places not listed may hold any number of tokens.
+        :max_states: Give up (RuntimeError) after visiting that many cuts.
+        """
+        wanted = [(self.compiled.place_index[name], tokens) for name, tokens in target.items()]
+        for found in self._search(lambda m, cut: all(m[p] == tokens for p, tokens in wanted),
+                                  False, max_states):
+            return found
+        return None
+
+    def _search(self, goal, persistent, max_states, every=False):
+        """
+        Depth-first search over the cuts of the configurations without cut-off events.
+        Yields the firing sequence of every cut whose marking satisfies goal(marking, cut),
+        or (cut, events, marking) for every cut with every=True.
+        """
+        preset_mask = [sum(1 << b for b in preset) for preset in self.event_preset]
+        consumers = [[] for _ in self.condition_place]
+        for e, preset in enumerate(self.event_preset):
+            if e not in self.cutoffs:
+                for b in preset:
+                    consumers[b].append(e)
+        alone = [all(consumers[b] == [e] for b in preset) for e, preset in enumerate(self.event_preset)]
+        postset_mask = [sum(1 << b for b in postset) for postset in self.event_postset]
+        names = self.compiled.transition_names
+
+        start = sum(1 << b for b, e in enumerate(self.condition_event) if e == -1)
+        parent = {start: None}      # cut -> (cut before, event)
+        stack = [(start, self.compiled.initial)]
+        while stack:
+            cut, marking = stack.pop()
+            if every or goal(marking, cut):
+                trace = []
+                at = cut
+                while parent[at] is not None:
+                    at, e = parent[at]
+                    trace.append(e)
+                trace.reverse()
+                if every:
+                    yield cut, trace, marking
+                else:
+                    yield [names[self.transition(e)] for e in trace]
+            ready = sorted(set(e for b in _bits(cut) for e in consumers[b]
+                               if preset_mask[e] & cut == preset_mask[e]))
+            if persistent:
+                single = [e for e in ready if alone[e]]
+                if single:
+                    ready = single[:1]
+            for e in reversed(ready):
+                successor = (cut & ~preset_mask[e]) | postset_mask[e]
+                if successor in parent:
+                    continue
+                if max_states is not None and len(parent) >= max_states:
+                    raise RuntimeError("No answer within {} cuts".format(max_states))
+                parent[successor] = (cut, e)
+                stack.append((successor, self.marking_after(marking, e)))
+
+    def marking_after(self, marking: tuple, event: int) -> tuple:
+        """
+        Marking reached from a marking by adding one event to the configuration
+        """
+        m = list(marking)
+        places = len(m)
+        _, pre, post = self.variants[self.event_variant[event]]
+        for p, w in pre.items():
+            if p < places:
+                m[p] -= w
+        for p, w in post.items():
+            if p < places:
+                m[p] += w
+        return tuple(m)
+
+
+def unfold(net, max_events=None) -> Prefix:
+    """
+    Complete finite prefix of the unfolding of a bounded net.
+    Possible extensions are added in the ERV adequate order (size, then sorted transitions, then Foata
+    normal form of the local configuration); an event is a cut-off if a smaller local configuration
+    already reached its marking. For nets of many independent components the prefix grows linearly
+    where the reachability graph grows exponentially. Every token of a place is a condition of its own,
+    so places holding many tokens give one event per choice of tokens.
+    :net: PetriNet or CompiledNet object.
+    :max_events: Stop after that many events (prefix.truncated tells), an unbounded net has no finite prefix.
+    """
+    compiled = as_compiled(net)
+    prefix = Prefix(compiled)
+    variants = prefix.variants
+    complement = prefix.complement
+    places = len(compiled.place_names)
+    capacity = compiled.capacity
+
+    initial = list(compiled.initial) + [0] * len(complement)
+    for p, c in complement.items():
+        if initial[p] > capacity[p]:
+            raise ValueError("Place '{}' holds more tokens than its capacity".format(compiled.place_names[p]))
+        initial[c] = capacity[p] - initial[p]
+
+    by_place = [[] for _ in initial]    # place -> conditions which may still be taken
+    takers = [[] for _ in initial]      # place -> variants taking from it
+    for v, (_, pre, _) in enumerate(variants):
+        for p in pre:
+            takers[p].append(v)
+    condition_place = prefix.condition_place
+    condition_event = prefix.condition_event
+    co = prefix._co
+
+    def add_conditions(places_produced, event, common, extendable) -> list:
+        first = len(condition_place)
+        new = list(range(first, first + len(places_produced)))
+        new_mask = sum(1 << b for b in new)
+        for b, p in zip(new, places_produced):
+            condition_place.append(p)
+            condition_event.append(event)
+            co.append(common | (new_mask ^ (1 << b)))
+            if extendable:
+                by_place[p].append(b)
+        for b in _bits(common):
+            co[b] |= new_mask
+        return new
+
+    def key(v, preset):
+        """
+        (ERV order key, local configuration before the event, depth) of a possible extension
+        """
+        local = 0
+        depth = 0
+        for b in preset:
+            e = condition_event[b]
+            if e != -1:
+                local |= prefix._local[e]
+                depth = max(depth, prefix._depth[e])
+        events = list(_bits(local))
+        word = sorted([prefix.event_variant[e] for e in events] + [v])
+        levels = [[] for _ in range(depth + 1)]
+        for e in events:
+            levels[prefix._depth[e] - 1].append(prefix.event_variant[e])
+        levels[depth].append(v)
+        return (len(events) + 1, tuple(word), tuple(tuple(sorted(level)) for level in levels)), local, depth + 1
+
+    seen = set()        # (variant, preset) already queued
+    queue = []
+
+    def extensions(new) -> None:
+        """
+        Queue every possible extension taking at least one of the new conditions
+        """
+        for c in new:
+            for v in takers[condition_place[c]]:
+                need = dict(variants[v][1])
+                need[condition_place[c]] -= 1
+                slots = sorted(need.items())
+
+                def choose(i, allowed, chosen):
+                    if i == len(slots):
+                        preset = tuple(sorted(chosen))
+                        if (v, preset) not in seen:
+                            seen.add((v, preset))
+                            order, local, depth = key(v, preset)
+                            heapq.heappush(queue, (order, v, preset, local, depth))
+                        return
+                    p, k = slots[i]
+                    candidates = [b for b in by_place[p] if allowed >> b & 1]
+                    for group in combinations(candidates, k):
+                        mask = allowed
+                        for b in group:
+                            if not mask >> b & 1:
+                                break
+                            mask &= co[b]
+                        else:
+                            choose(i + 1, mask, chosen + list(group))
+
+                choose(0, co[c], [c])
+
+    start = add_conditions([p for p, tokens in enumerate(initial) for _ in range(tokens)], -1, 0, True)
+    smallest = {tuple(compiled.initial): ()}    # marking -> smallest order key of a local configuration reaching it
+    extensions(start)
+    while queue:
+        if max_events is not None and len(prefix) >= max_events:
+            prefix.truncated = True
+            break
+        order, v, preset, local, depth = heapq.heappop(queue)
+        e = len(prefix.event_variant)
+        prefix.event_variant.append(v)
+        prefix.event_preset.append(preset)
+        prefix._local.append(local | (1 << e))
+        prefix._depth.append(depth)
+        marking = prefix.marking(_bits(local | (1 << e)))
+        # the queue is in the adequate order, so the first key of a marking is its smallest one.
+        # Tokens of one place are interchangeable, different configurations can have equal keys,
+        # only a strictly smaller one makes a cut-off
+        cutoff = marking in smallest and smallest[marking] < order
+        smallest.setdefault(marking, order)
+        if cutoff:
+            prefix.cutoffs.add(e)
+        common = -1
+        for b in preset:
+            common &= co[b]
+        produced = [p for p, w in sorted(variants[v][2].items()) for _ in range(w)]
+        new = add_conditions(produced, e, common, not cutoff)
+        prefix.event_postset.append(tuple(new))
+        if not cutoff:
+            extensions(new)
+    return prefix
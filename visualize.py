@@ -0,0 +1,169 @@
+"""
+Cached visualization: the layout of a net structure is computed once, every marking
+only patches the token labels and is rendered in a background thread pool
+"""
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from engine import as_compiled
+
+_NODE_STYLE = 'height=1.5 penwidth=3.0 fontname="Sans Not-Rotated 20" fontsize=20'
+_templates = {}     # net structure -> DOT body with one {} per place for its tokens
+
+
+def _quote(text: str) -> str:
+    """
+    DOT string literal of the text
+    """
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+def _braces(text: str) -> str:
+    """
+    Text with its braces doubled, so str.format leaves them alone
+    """
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def _body(compiled, positions=None) -> str:
+    """
+    DOT statements of the net, place labels end with a {} for the tokens.
+    Nodes are named p<index> and t<index>, so the names stay the same for every marking.
+    :positions: Optional {node name: (x, y)} in points, pinned with pos="x,y!".
+    """
+    def pos(node) -> str:
+        if positions is None or node not in positions:
+            return ""
+        return ' pos="{:.2f},{:.2f}!"'.format(*positions[node])
+
+    lines = ["rankdir=LR", "node [shape=circle {}]".format(_NODE_STYLE)]
+    for p, name in enumerate(compiled.place_names):
+        label = _braces(_quote(name + "\n"))[:-1] + '{}"'
+        lines.append("p{} [label={}{}]".format(p, label, pos("p{}".format(p))))
+    lines.append("node [shape=box {}]".format(_NODE_STYLE))
+    for t, name in enumerate(compiled.transition_names):
+        lines.append("t{} [label={}{}]".format(t, _braces(_quote(name)), pos("t{}".format(t))))
+    for t in range(len(compiled.transition_names)):
+        lines += ["p{} -> t{} [penwidth=3.0]".format(p, t) for p, _ in compiled.pre[t]]
+        lines += ["t{} -> p{} [penwidth=3.0]".format(t, p) for p, _ in compiled.post[t]]
+    return "\n".join(lines)
+
+
+def _layout(compiled) -> dict:
+    """
+    Node positions (points) computed by the dot binary, None if it isn't installed
+    """
+    dot = shutil.which("dot")
+    if dot is None:
+        return None
+    text = "digraph {{\n{}\n}}\n".format(_body(compiled).format(*[0] * len(compiled.place_names)))
+    plain = subprocess.run([dot, "-Tplain"], input=text, capture_output=True, text=True, check=True).stdout
+    positions = {}
+    for line in plain.splitlines():
+        fields = line.split()
+        if fields and fields[0] == "node":
+            positions[fields[1]] = (float(fields[2]) * 72, float(fields[3]) * 72)
+    return positions
+
+
+def template(net) -> str:
+    """
+    DOT body of the net structure with the layout pinned in, cached per structure
+    :net: PetriNet or CompiledNet object.
+    """
+    compiled = as_compiled(net)
+    key = (tuple(compiled.place_names), tuple(compiled.transition_names), tuple(compiled.pre), tuple(compiled.post))
+    body = _templates.get(key)
+    if body is None:
+        body = _body(compiled, _layout(compiled))
+        _templates[key] = body
+    return body
+
+
+def dot_source(net, marking=None, name="petri_net") -> str:
+    """
+    DOT source of the net at a marking
+    :net: PetriNet or CompiledNet object.
+    :marking: Tokens of the places (the initial marking if not given).
+    :name: Name of the graph.
+    """
+    compiled = as_compiled(net)
+    marking = compiled.initial if marking is None else marking
+    return "digraph {} {{\n{}\n}}\n".format(_quote(name),
+                                            template(compiled).format(*marking))
+
+
+class Renderer:
+    def __init__(self, net, folder: str, format="svg", workers=4):
+        """
+        Write a net at many markings into a folder, in a background thread pool.
+        Every marking gets a .dot file; with the graphviz binaries installed it is also
+        rendered to the format with the cached layout (neato -n2, no new layout, no viewer).
+        :net: PetriNet or CompiledNet object (its structure, markings are given to submit).
+        :folder: Output folder, created if missing.
+        :format: Output format of graphviz ("svg", "png", ...).
+        :workers: Number of rendering threads.
+        """
+        self.compiled = as_compiled(net)
+        self.folder = folder
+        self.format = format
+        self.body = template(self.compiled)     # layout once, in the calling thread
+        self.neato = shutil.which("neato")
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._futures = []
+        os.makedirs(folder, exist_ok=True)
+
+    def submit(self, marking, name: str):
+        """
+        Queue one marking, return the future of the written file path
+        """
+        future = self._pool.submit(self._render, tuple(marking), name)
+        self._futures.append(future)
+        return future
+
+    def _render(self, marking: tuple, name: str) -> str:
+        path = os.path.join(self.folder, name + ".dot")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("digraph {} {{\n{}\n}}\n".format(_quote(name),
+                                                    self.body.format(*marking)))
+        if self.neato is None:
+            return path
+        output = os.path.join(self.folder, "{}.{}".format(name, self.format))
+        subprocess.run([self.neato, "-n2", "-T" + self.format, "-o", output, path], check=True)
+        return output
+
+    def wait(self) -> list:
+        """
+        Wait for everything submitted so far, return the written file paths in submit order
+        """
+        paths = [future.result() for future in self._futures]
+        self._futures = []
+        return paths
+
+    def close(self) -> list:
+        paths = self.wait()
+        self._pool.shutdown()
+        return paths
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def render_trace(net, markings, folder: str, prefix="step", format="svg", workers=4) -> list:
+    """
+    Render every marking of a trace (e.g. SimulationResult.markings) as one frame, return the file paths
+    :net: PetriNet or CompiledNet object.
+    :markings: The markings in order.
+    :folder: Output folder.
+    :prefix: File names are <prefix>_<number>.
+    """
+    markings = list(markings)
+    with Renderer(net, folder, format, workers) as renderer:
+        width = len(str(len(markings)))
+        for i, marking in enumerate(markings):
+            renderer.submit(marking, "{}_{}".format(prefix, str(i).zfill(width)))
+        return renderer.wait()